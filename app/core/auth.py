@@ -1,10 +1,15 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Any, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app.db.database import get_db
 from app.models.models import User
 from app.schemas.schemas import TokenData
@@ -25,9 +30,41 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
+# Recently verified passwords, keyed by the stored hash and an HMAC of the
+# submitted password so plain-text passwords are never kept in memory
+VERIFIED_PASSWORD_CACHE_SIZE = 1024
+VERIFIED_PASSWORD_CACHE_TTL_SECONDS = 300
+_verified_passwords: "OrderedDict[tuple, float]" = OrderedDict()
+_verified_passwords_lock = threading.Lock()
+
+# Recently authenticated users' column values, keyed by user ID, so repeated
+# requests with the same token skip the user lookup
+CURRENT_USER_CACHE_SIZE = 10000
+CURRENT_USER_CACHE_TTL_SECONDS = 30
+_current_users: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_current_users_lock = threading.Lock()
+
 def verify_password(plain_password, hashed_password):
     """Verify that the password matches the hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    cache_key = (
+        hashed_password,
+        hmac.new(SECRET_KEY.encode(), plain_password.encode(), hashlib.sha256).digest()
+    )
+    now = time.monotonic()
+    expires_at = _verified_passwords.get(cache_key)
+    if expires_at is not None and expires_at > now:
+        return True
+    
+    # Only successful checks are cached, failed attempts always pay the full hash cost
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+    
+    with _verified_passwords_lock:
+        _verified_passwords[cache_key] = now + VERIFIED_PASSWORD_CACHE_TTL_SECONDS
+        _verified_passwords.move_to_end(cache_key)
+        while len(_verified_passwords) > VERIFIED_PASSWORD_CACHE_SIZE:
+            _verified_passwords.popitem(last=False)
+    return True
 
 def get_password_hash(password):
     """Hash a password for storing"""
@@ -53,7 +90,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Get the current user from the token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -69,11 +106,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(username=username, user_id=user_id)
     except JWTError:
         raise credentials_exception
+    
+    with _current_users_lock:
+        cached = _current_users.get(user_id)
+    if cached is not None and cached[0] > time.monotonic():
+        # Rebuild the user from the cached columns as if it had been loaded, and
+        # attach it to this request's session without a query, so relationships
+        # load and the instance can be changed and committed like a queried one
+        user = User(**cached[1])
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+    
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
+    
+    with _current_users_lock:
+        _current_users[user_id] = (
+            time.monotonic() + CURRENT_USER_CACHE_TTL_SECONDS,
+            {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        )
+        _current_users.move_to_end(user_id)
+        while len(_current_users) > CURRENT_USER_CACHE_SIZE:
+            _current_users.popitem(last=False)
     return user
 
+def invalidate_current_user(user_id: int):
+    """Drop the cached user so the next request reloads it"""
+    with _current_users_lock:
+        _current_users.pop(user_id, None)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Get the current active user"""
     if not current_user.is_active:
@@ -1,12 +1,23 @@
 import asyncio
 import logging
-import time
-from datetime import datetime
+from datetime import datetime, timezone
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from app.db.database import SessionLocal
+from app.models.models import EmailAccount, WarmupConfig
 from app.services.warmup_service import WarmupService
+from app.services.email_service import EmailService, smtp_pool, imap_sessions, SMTP_IDLE_TIMEOUT, IMAP_KEEPALIVE_INTERVAL
 
 logger = logging.getLogger(__name__)
 
+# Runs the periodic warmup cycle and manually requested warmup runs, so that
+# neither is tied to the lifetime of the request that triggered it
+scheduler = AsyncIOScheduler(timezone="UTC")
+
+# IDLE watchers by email account ID, with the IMAP settings each was started with
+inbox_watchers = {}
+
 async def run_warmup_cycle_task():
     """
     Run a warmup cycle for all active and verified accounts
@@ -23,28 +34,183 @@ async def run_warmup_cycle_task():
     finally:
         db.close()
 
-async def scheduler():
+async def send_warmup_emails_task(email_account_id: int):
+    """
+    Send warmup emails for a single account
+    """
+    logger.info(f"Running warmup for account {email_account_id}")
+    db = SessionLocal()
+    try:
+        result = await WarmupService.send_warmup_emails(db, email_account_id)
+        if not result.get("success", False):
+            logger.warning(f"Warmup for account {email_account_id} failed: {result.get('error')}")
+    except Exception as e:
+        logger.error(f"Error in warmup for account {email_account_id}: {str(e)}")
+    finally:
+        db.close()
+
+async def process_incoming_emails_task(email_account_id: int):
+    """
+    Process incoming warmup emails for a single account
+    """
+    db = SessionLocal()
+    try:
+        result = await WarmupService.process_incoming_warmup_emails(db, email_account_id)
+        if not result.get("success", False):
+            logger.warning(f"Processing incoming emails for account {email_account_id} failed: {result.get('errors')}")
+    except Exception as e:
+        logger.error(f"Error processing incoming emails for account {email_account_id}: {str(e)}")
+    finally:
+        db.close()
+
+async def watch_inbox_task(email_account: EmailAccount):
     """
-    Scheduler function that runs tasks periodically
+    Process incoming warmup emails as soon as the account's IMAP server reports them
     """
-    while True:
-        # Get current hour
-        current_hour = datetime.utcnow().hour
-        
-        # Run warmup cycle every 6 hours
-        if current_hour % 6 == 0:
-            await run_warmup_cycle_task()
-        
-        # Sleep until the next hour
-        next_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-        next_hour = next_hour.replace(hour=next_hour.hour + 1)
-        sleep_seconds = (next_hour - datetime.utcnow()).total_seconds()
-        await asyncio.sleep(sleep_seconds)
+    # A watcher that returns normally found no IDLE support, and is left in
+    # inbox_watchers so the account stays with the polling warmup cycle until
+    # its IMAP settings change
+    await EmailService.watch_inbox(
+        email_account,
+        lambda: process_incoming_emails_task(email_account.id)
+    )
+
+def get_watched_accounts():
+    """
+    Active and verified accounts with an active warmup configuration
+    """
+    db = SessionLocal()
+    try:
+        return db.query(EmailAccount).join(
+            WarmupConfig,
+            EmailAccount.id == WarmupConfig.email_account_id
+        ).filter(
+            EmailAccount.is_active == True,
+            EmailAccount.is_verified == True,
+            WarmupConfig.is_active == True
+        ).all()
+    finally:
+        db.close()
+
+def _imap_settings(email_account: EmailAccount):
+    return (email_account.imap_host, email_account.imap_port, email_account.imap_username, email_account.imap_password)
+
+def _watcher_ended(task: asyncio.Task) -> bool:
+    """
+    Whether the watcher stopped for a reason other than its server lacking IDLE
+    """
+    if not task.done():
+        return False
+    if task.cancelled():
+        return True
+    if task.exception() is not None:
+        logger.error(f"IDLE watcher failed: {str(task.exception())}")
+        return True
+    return False
+
+async def start_inbox_watchers():
+    """
+    Start IDLE watchers for active and verified accounts not being watched yet,
+    restart those whose IMAP settings changed or that stopped unexpectedly, and
+    stop those of accounts that are no longer active.
+    A coroutine so the scheduler runs it on the event loop the watcher tasks belong to.
+    """
+    accounts = await asyncio.to_thread(get_watched_accounts)
+    
+    settings = {account.id: _imap_settings(account) for account in accounts}
+    for email_account_id, (watched_settings, task) in list(inbox_watchers.items()):
+        if settings.get(email_account_id) != watched_settings or _watcher_ended(task):
+            task.cancel()
+            del inbox_watchers[email_account_id]
+    
+    for account in accounts:
+        if account.id not in inbox_watchers:
+            inbox_watchers[account.id] = (settings[account.id], asyncio.create_task(watch_inbox_task(account)))
+
+async def keep_imap_sessions_alive():
+    """
+    Keep the IMAP sessions of accounts still being warmed up open, and log out of the others
+    """
+    accounts = await asyncio.to_thread(get_watched_accounts)
+    await imap_sessions.keep_alive({account.id for account in accounts})
+
+def stop_inbox_watchers():
+    """
+    Cancel all IDLE watchers
+    """
+    for _, task in inbox_watchers.values():
+        task.cancel()
+    inbox_watchers.clear()
+
+def enqueue_warmup_for_account(email_account_id: int):
+    """
+    Queue a warmup run for a single account, replacing one still waiting to start
+    """
+    scheduler.add_job(
+        send_warmup_emails_task,
+        args=[email_account_id],
+        id=f"warmup_account_{email_account_id}",
+        replace_existing=True,
+        # The request was accepted, so run it however late the scheduler gets to it
+        misfire_grace_time=None
+    )
+
+def enqueue_warmup_cycle():
+    """
+    Bring the next scheduled warmup cycle forward to now
+    """
+    scheduler.modify_job("warmup_cycle", next_run_time=datetime.now(timezone.utc), misfire_grace_time=None)
 
 def start_scheduler():
     """
-    Start the scheduler in a background task
+    Start the scheduler on the running event loop
+    """
+    # Run warmup cycle every 6 hours (00:00, 06:00, 12:00, 18:00 UTC)
+    scheduler.add_job(
+        run_warmup_cycle_task,
+        CronTrigger(hour="*/6", minute=0, timezone="UTC"),
+        id="warmup_cycle",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        # Run late rather than skip a cycle when the loop was busy at the scheduled time
+        misfire_grace_time=None
+    )
+    # Close pooled SMTP connections the servers would otherwise drop
+    scheduler.add_job(
+        smtp_pool.close_idle,
+        IntervalTrigger(seconds=SMTP_IDLE_TIMEOUT, timezone="UTC"),
+        id="smtp_pool_reaper",
+        replace_existing=True,
+        coalesce=True
+    )
+    # Keep the IMAP sessions reused by inbox checks from timing out
+    scheduler.add_job(
+        keep_imap_sessions_alive,
+        IntervalTrigger(seconds=IMAP_KEEPALIVE_INTERVAL, timezone="UTC"),
+        id="imap_keepalive",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    # Watch inboxes with IDLE, also picking up accounts activated since the last run
+    scheduler.add_job(
+        start_inbox_watchers,
+        IntervalTrigger(minutes=5, timezone="UTC"),
+        id="inbox_watchers",
+        replace_existing=True,
+        next_run_time=datetime.now(timezone.utc),
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.start()
+    return scheduler
+
+def stop_scheduler():
+    """
+    Stop the scheduler without waiting for running jobs
     """
-    loop = asyncio.get_event_loop()
-    task = loop.create_task(scheduler())
-    return task 
\ No newline at end of file
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    stop_inbox_watchers()
+    smtp_pool.close_all()
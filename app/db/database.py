@@ -1,17 +1,49 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text, insert, update, select, literal
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, Optional
+import logging
 import os
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./email_warmup.db")
 
+# Connection pool settings (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
 # Create engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL journaling and relaxed fsync for SQLite connections"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_use_lifo=True,  # Reuse the most recently used connection, let idle ones expire
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE
+    )
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -27,6 +59,65 @@ def get_db():
     finally:
         db.close()
 
+def insert_returning(db: Session, model, values: Dict[str, Any], criterion=None) -> Optional[Dict[str, Any]]:
+    """
+    Insert a row and commit, returning its column values including defaults.
+    If criterion is given the row is only inserted when it matches, within the same
+    statement, and None is returned otherwise.
+    Uses INSERT ... RETURNING where the database supports it, otherwise re-selects the row.
+    """
+    columns = model.__table__.c
+    if criterion is None:
+        stmt = insert(model).values(**values)
+    else:
+        stmt = insert(model).from_select(
+            list(values),
+            select(*[literal(value) for value in values.values()]).where(criterion)
+        )
+    
+    if db.get_bind().dialect.insert_returning:
+        row = db.execute(stmt.returning(*columns)).mappings().one_or_none()
+    else:
+        result = db.execute(stmt)
+        row = None
+        if result.rowcount:
+            row = db.execute(
+                select(*columns).where(model.id == result.lastrowid)
+            ).mappings().one()
+    db.commit()
+    return dict(row) if row is not None else None
+
+def update_returning(db: Session, model, criterion, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Update the row matching criterion and commit, returning its new column values,
+    or None if no row matched.
+    Uses UPDATE ... RETURNING where the database supports it, otherwise re-selects the row.
+    """
+    columns = model.__table__.c
+    stmt = update(model).where(criterion).values(**values)
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(stmt.returning(*columns)).mappings().one_or_none()
+    else:
+        db.execute(stmt)
+        row = db.execute(select(*columns).where(criterion)).mappings().one_or_none()
+    db.commit()
+    return dict(row) if row is not None else None
+
 def create_tables():
     """Create database tables"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+# Tables read by the dashboard on every request
+PREWARM_TABLES = ["warmup_emails", "warmup_stats"]
+
+def warm_up_database():
+    """Load the hot dashboard tables into the database cache before serving traffic"""
+    for table in PREWARM_TABLES:
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == "postgresql":
+                    connection.execute(text("SELECT pg_prewarm(:table)"), {"table": table})
+                else:
+                    connection.execute(text(f"SELECT count(*) FROM {table}"))
+        except Exception as e:
+            logger.warning(f"Failed to prewarm table {table}: {str(e)}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Float, Text, JSON, Table
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Float, Text, JSON, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -56,6 +56,7 @@ class EmailAccount(Base):
     sent_emails = relationship("WarmupEmail", back_populates="sender", foreign_keys="[WarmupEmail.sender_id]", cascade="all, delete-orphan")
     received_emails = relationship("WarmupEmail", back_populates="recipient", foreign_keys="[WarmupEmail.recipient_id]", cascade="all, delete-orphan")
     dns_records = relationship("DomainDNSRecord", back_populates="email_account", cascade="all, delete-orphan")
+    summary = relationship("WarmupSummary", back_populates="email_account", cascade="all, delete-orphan", uselist=False)
     
     def __repr__(self):
         return f"<EmailAccount {self.email_address}>"
@@ -63,6 +64,9 @@ class EmailAccount(Base):
 class WarmupConfig(Base):
     """Email warmup configuration model"""
     __tablename__ = "warmup_configs"
+    __table_args__ = (
+        Index("ix_warmup_configs_active_account", "is_active", "email_account_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -93,6 +97,9 @@ class WarmupConfig(Base):
 class WarmupStat(Base):
     """Daily email warmup statistics model"""
     __tablename__ = "warmup_stats"
+    __table_args__ = (
+        Index("ix_warmup_stats_account_date", "email_account_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email_account_id = Column(Integer, ForeignKey("email_accounts.id"))
@@ -113,9 +120,36 @@ class WarmupStat(Base):
     def __repr__(self):
         return f"<WarmupStat for {self.email_account_id} on {self.date}>"
 
+class WarmupSummary(Base):
+    """Precomputed warmup totals and latest rates for an email account"""
+    __tablename__ = "warmup_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_account_id = Column(Integer, ForeignKey("email_accounts.id"), unique=True)
+    total_emails_sent = Column(Integer, default=0)
+    total_emails_received = Column(Integer, default=0)
+    deliverability_score = Column(Float, default=100.0)  # From the latest daily stats
+    open_rate = Column(Float, default=0.0)
+    reply_rate = Column(Float, default=0.0)
+    spam_rate = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    email_account = relationship("EmailAccount", back_populates="summary")
+    
+    def __repr__(self):
+        return f"<WarmupSummary for {self.email_account_id}>"
+
 class WarmupEmail(Base):
     """Email sent during warmup process"""
     __tablename__ = "warmup_emails"
+    __table_args__ = (
+        Index("ix_warmup_emails_sender_status", "sender_id", "status"),
+        Index("ix_warmup_emails_recipient_status", "recipient_id", "status"),
+        # Cover every column the daily stats query reads, so it never touches the table rows
+        Index("ix_warmup_emails_sender_sent", "sender_id", "sent_at", "status"),
+        Index("ix_warmup_emails_recipient_delivered", "recipient_id", "delivered_at", "status", "in_spam", "opened_at", "replied_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     message_id = Column(String(255), unique=True, index=True)
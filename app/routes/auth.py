@@ -2,15 +2,16 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy import exists
 from app.core.auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
-from app.db.database import get_db
+from app.db.database import get_db, insert_returning
 from app.models.models import User
 from app.schemas.schemas import Token, UserCreate, User as UserSchema
 
 router = APIRouter()
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Authenticate and generate an access token for a user
     """
@@ -32,19 +33,23 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserSchema)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     """
     Register a new user
     """
-    # Check if username exists
-    if db.query(User).filter(User.username == user_data.username).first():
+    # Check if username or email exists
+    username_taken, email_taken = db.query(
+        exists().where(User.username == user_data.username),
+        exists().where(User.email == user_data.email)
+    ).one()
+    
+    if username_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -52,16 +57,12 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # Create user
     hashed_password = get_password_hash(user_data.password)
-    db_user = User(
+    db_user = insert_returning(db, User, dict(
         username=user_data.username,
         email=user_data.email,
         hashed_password=hashed_password,
         full_name=user_data.full_name,
         company=user_data.company
-    )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    ))
     
     return db_user 
\ No newline at end of file
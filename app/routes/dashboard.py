@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, and_, or_
 from typing import List, Dict, Any
 from app.core.auth import get_current_active_user
 from app.db.database import get_db
@@ -12,15 +12,19 @@ from datetime import datetime, timedelta
 router = APIRouter()
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
     Get dashboard statistics for the current user
     """
-    # Get email accounts
-    accounts = db.query(EmailAccount).filter(
+    # Get email accounts (only the columns needed for the counts)
+    accounts = db.query(
+        EmailAccount.id,
+        EmailAccount.is_active,
+        EmailAccount.is_verified
+    ).filter(
         EmailAccount.user_id == current_user.id
     ).all()
     
@@ -37,28 +41,32 @@ async def get_dashboard_stats(
             account_stats=[]
         )
     
-    # Count accounts
+    # Count accounts and collect their IDs in a single pass
     total_accounts = len(accounts)
-    active_accounts = len([a for a in accounts if a.is_active])
-    verified_accounts = len([a for a in accounts if a.is_verified])
-    
-    # Get account IDs
-    account_ids = [a.id for a in accounts]
+    active_accounts = 0
+    verified_accounts = 0
+    account_ids = []
+    for account in accounts:
+        account_ids.append(account.id)
+        if account.is_active:
+            active_accounts += 1
+        if account.is_verified:
+            verified_accounts += 1
     
     # Get email stats
-    total_emails_sent = db.query(func.count(WarmupEmail.id)).filter(
-        WarmupEmail.sender_id.in_(account_ids)
-    ).scalar() or 0
-    
-    total_emails_opened = db.query(func.count(WarmupEmail.id)).filter(
-        WarmupEmail.recipient_id.in_(account_ids),
-        WarmupEmail.status.in_(["opened", "replied"])
-    ).scalar() or 0
+    sent_by_user = WarmupEmail.sender_id.in_(account_ids)
+    received_by_user = WarmupEmail.recipient_id.in_(account_ids)
+    email_counts = db.query(
+        func.sum(case((sent_by_user, 1), else_=0)),
+        func.sum(case((and_(received_by_user, WarmupEmail.status.in_(["opened", "replied"])), 1), else_=0)),
+        func.sum(case((and_(received_by_user, WarmupEmail.status == "replied"), 1), else_=0))
+    ).filter(
+        or_(sent_by_user, received_by_user)
+    ).one()
     
-    total_emails_replied = db.query(func.count(WarmupEmail.id)).filter(
-        WarmupEmail.recipient_id.in_(account_ids),
-        WarmupEmail.status == "replied"
-    ).scalar() or 0
+    total_emails_sent = email_counts[0] or 0
+    total_emails_opened = email_counts[1] or 0
+    total_emails_replied = email_counts[2] or 0
     
     # Get average deliverability
     latest_stats = db.query(WarmupStat).filter(
@@ -72,9 +80,10 @@ async def get_dashboard_stats(
         average_deliverability = 100.0  # Default if no stats
     
     # Get account stats
+    statuses = WarmupService.get_warmup_statuses(db, account_ids)
     account_stats = []
     for account in accounts:
-        status = await WarmupService.get_warmup_status(db, account.id)
+        status = statuses.get(account.id, {})
         if status.get("success", False):
             account_stats.append(WarmupStatusResponse(
                 email_account_id=account.id,
@@ -103,7 +112,7 @@ async def get_dashboard_stats(
     )
 
 @router.get("/history/{email_account_id}")
-async def get_account_history(
+def get_account_history(
     email_account_id: int,
     days: int = 30,
     current_user: User = Depends(get_current_active_user),
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from sqlalchemy.orm import Session, load_only, raiseload
+from sqlalchemy import update, exists
+from typing import List, Optional
 from app.core.auth import get_current_active_user
 from app.db.database import get_db
 from app.models.models import User, EmailAccount, WarmupConfig
@@ -10,33 +12,68 @@ from app.services.dns_service import DNSService
 
 router = APIRouter()
 
+# Fields that require re-verifying the SMTP/IMAP connection when changed
+CONNECTION_FIELDS = {
+    "smtp_host", "smtp_port", "smtp_username", "smtp_password",
+    "imap_host", "imap_port", "imap_username", "imap_password"
+}
+
+# Loader options for read-only endpoints: fetch just the columns exposed by
+# EmailAccountSchema and never lazy-load relationships during serialization
+ACCOUNT_READ_OPTIONS = (
+    load_only(
+        EmailAccount.id,
+        EmailAccount.email_address,
+        EmailAccount.display_name,
+        EmailAccount.domain,
+        EmailAccount.is_active,
+        EmailAccount.is_verified,
+        EmailAccount.verification_status,
+        EmailAccount.created_at,
+        EmailAccount.updated_at
+    ),
+    raiseload("*")
+)
+
 @router.get("/", response_model=List[EmailAccountSchema])
-async def read_email_accounts(
+def read_email_accounts(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get all email accounts for the current user
+    Get all email accounts for the current user.
+    Pass the last seen account ID as after_id to page by key instead of offset.
     """
-    email_accounts = db.query(EmailAccount).filter(
+    query = db.query(EmailAccount).options(*ACCOUNT_READ_OPTIONS).filter(
         EmailAccount.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ).order_by(EmailAccount.id)
+    
+    if after_id is not None:
+        query = query.filter(EmailAccount.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    email_accounts = query.limit(limit).all()
     
     return email_accounts
 
 @router.post("/", response_model=EmailAccountSchema)
 async def create_email_account(
     email_account: EmailAccountCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    Create a new email account
+    Create a new email account.
+    An account that fails SMTP/IMAP verification is still stored, with a
+    "failed" verification status, and a 400 error is returned.
     """
     # Check if email account already exists
-    if db.query(EmailAccount).filter(EmailAccount.email_address == email_account.email_address).first():
+    if db.query(exists().where(EmailAccount.email_address == email_account.email_address)).scalar():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email account already registered"
@@ -61,47 +98,46 @@ async def create_email_account(
         domain=domain
     )
     
-    db.add(db_email_account)
-    db.commit()
-    db.refresh(db_email_account)
-    
     # Verify SMTP and IMAP connections
-    smtp_verified = await EmailService.verify_smtp_connection(db_email_account)
-    imap_verified = await EmailService.verify_imap_connection(db_email_account)
+    smtp_port, imap_verified = await asyncio.gather(
+        EmailService.verify_smtp_connection(db_email_account),
+        EmailService.verify_imap_connection(db_email_account)
+    )
+    smtp_verified = smtp_port is not None
     
-    # Update verification status
+    # Update verification status, keeping the SMTP port that verification settled on
     if smtp_verified and imap_verified:
         db_email_account.verification_status = "verified"
+        db_email_account.smtp_port = smtp_port
     else:
-        db_email_account.verification_status = "failed"
         error_details = []
         if not smtp_verified:
             error_details.append("SMTP connection failed")
         if not imap_verified:
             error_details.append("IMAP connection failed")
         
+        # Keep the failed account, without a warmup configuration
+        db_email_account.verification_status = "failed"
+        db.add(db_email_account)
+        db.commit()
+        
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Email account verification failed: {', '.join(error_details)}"
         )
     
-    # Generate DNS records for the domain
-    dns_result = await DNSService.verify_dns_records(db, db_email_account.id)
-    
-    # Create default warmup configuration
-    warmup_config = WarmupConfig(
-        user_id=current_user.id,
-        email_account_id=db_email_account.id
-    )
-    db.add(warmup_config)
-    
+    # Insert the account together with its default warmup configuration
+    db_email_account.config = WarmupConfig(user_id=current_user.id)
+    db.add(db_email_account)
     db.commit()
-    db.refresh(db_email_account)
+    
+    # Generate DNS records for the domain once the response has been sent
+    background_tasks.add_task(DNSService.verify_dns_records_task, db_email_account.id)
     
     return db_email_account
 
 @router.get("/{email_account_id}", response_model=EmailAccountSchema)
-async def read_email_account(
+def read_email_account(
     email_account_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -109,7 +145,7 @@ async def read_email_account(
     """
     Get email account by ID
     """
-    email_account = db.query(EmailAccount).filter(
+    email_account = db.query(EmailAccount).options(*ACCOUNT_READ_OPTIONS).filter(
         EmailAccount.id == email_account_id,
         EmailAccount.user_id == current_user.id
     ).first()
@@ -143,80 +179,53 @@ async def update_email_account(
             detail="Email account not found"
         )
     
-    # Update fields
-    if email_account_update.display_name is not None:
-        db_email_account.display_name = email_account_update.display_name
-    
-    if email_account_update.smtp_host is not None:
-        db_email_account.smtp_host = email_account_update.smtp_host
-    
-    if email_account_update.smtp_port is not None:
-        db_email_account.smtp_port = email_account_update.smtp_port
-    
-    if email_account_update.smtp_username is not None:
-        db_email_account.smtp_username = email_account_update.smtp_username
-    
-    if email_account_update.smtp_password is not None:
-        db_email_account.smtp_password = email_account_update.smtp_password
-    
-    if email_account_update.imap_host is not None:
-        db_email_account.imap_host = email_account_update.imap_host
-    
-    if email_account_update.imap_port is not None:
-        db_email_account.imap_port = email_account_update.imap_port
-    
-    if email_account_update.imap_username is not None:
-        db_email_account.imap_username = email_account_update.imap_username
-    
-    if email_account_update.imap_password is not None:
-        db_email_account.imap_password = email_account_update.imap_password
-    
-    if email_account_update.is_active is not None:
-        db_email_account.is_active = email_account_update.is_active
-    
-    # Commit changes
-    db.commit()
-    
-    # Verify SMTP and IMAP connections if credentials changed
-    connection_updated = any([
-        email_account_update.smtp_host is not None,
-        email_account_update.smtp_port is not None,
-        email_account_update.smtp_username is not None,
-        email_account_update.smtp_password is not None,
-        email_account_update.imap_host is not None,
-        email_account_update.imap_port is not None,
-        email_account_update.imap_username is not None,
-        email_account_update.imap_password is not None
-    ])
-    
-    if connection_updated:
-        smtp_verified = await EmailService.verify_smtp_connection(db_email_account)
-        imap_verified = await EmailService.verify_imap_connection(db_email_account)
+    # Update only the fields that were provided
+    changed = email_account_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not changed:
+        return db_email_account
+    
+    # Verify SMTP and IMAP connections against the new settings if credentials changed
+    verification_failed = False
+    if changed.keys() & CONNECTION_FIELDS:
+        candidate = EmailAccount(**{
+            field: changed.get(field, getattr(db_email_account, field))
+            for field in CONNECTION_FIELDS
+        })
+        smtp_port, imap_verified = await asyncio.gather(
+            EmailService.verify_smtp_connection(candidate),
+            EmailService.verify_imap_connection(candidate)
+        )
+        smtp_verified = smtp_port is not None
         
-        # Update verification status
+        # Update verification status, keeping the SMTP port that verification settled on
         if smtp_verified and imap_verified:
-            db_email_account.verification_status = "verified"
+            changed["verification_status"] = "verified"
+            changed["smtp_port"] = smtp_port
         else:
-            db_email_account.verification_status = "failed"
+            changed["verification_status"] = "failed"
+            verification_failed = True
             error_details = []
             if not smtp_verified:
                 error_details.append("SMTP connection failed")
             if not imap_verified:
                 error_details.append("IMAP connection failed")
-            
-            db.commit()
-            
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Email account verification failed: {', '.join(error_details)}"
-            )
     
-    db.refresh(db_email_account)
+    # Write the field changes and the verification outcome in one commit
+    db.execute(
+        update(EmailAccount).where(EmailAccount.id == email_account_id).values(**changed)
+    )
+    db.commit()
+    
+    if verification_failed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Email account verification failed: {', '.join(error_details)}"
+        )
     
     return db_email_account
 
 @router.delete("/{email_account_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_email_account(
+def delete_email_account(
     email_account_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -260,17 +269,19 @@ async def verify_email_account(
             detail="Email account not found"
         )
     
-    # Verify SMTP and IMAP connections
-    smtp_verified = await EmailService.verify_smtp_connection(email_account)
-    imap_verified = await EmailService.verify_imap_connection(email_account)
-    
-    # Verify DNS records
-    dns_result = await DNSService.verify_dns_records(db, email_account_id)
+    # Verify SMTP and IMAP connections and DNS records
+    smtp_port, imap_verified, dns_result = await asyncio.gather(
+        EmailService.verify_smtp_connection(email_account),
+        EmailService.verify_imap_connection(email_account),
+        DNSService.verify_dns_records(db, email_account_id)
+    )
+    smtp_verified = smtp_port is not None
     
-    # Update verification status
+    # Update verification status, keeping the SMTP port that verification settled on
     if smtp_verified and imap_verified and dns_result.get("verified", False):
         email_account.is_verified = True
         email_account.verification_status = "verified"
+        email_account.smtp_port = smtp_port
     else:
         email_account.is_verified = False
         email_account.verification_status = "failed"
@@ -1,22 +1,82 @@
+import threading
+from collections import OrderedDict
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List
-from app.core.auth import get_current_active_user, get_current_admin_user, get_password_hash
-from app.db.database import get_db
+from sqlalchemy import exists
+from typing import List, Dict, Any, Optional
+from app.core.auth import get_current_active_user, get_current_admin_user, get_password_hash, invalidate_current_user
+from app.db.database import get_db, update_returning
 from app.models.models import User
 from app.schemas.schemas import User as UserSchema, UserUpdate
 
 router = APIRouter()
 
+# Fields a user may change through PUT /me; is_active is admin-only
+SELF_EDITABLE_USER_FIELDS = {"email", "username", "full_name", "company"}
+
+# Serialized /users/me responses, keyed by the user's exposed field values so
+# any change to the user (including updated_at) produces a new entry
+SERIALIZED_USER_CACHE_SIZE = 4096
+_serialized_users: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_serialized_users_lock = threading.Lock()
+
+# Columns exposed by UserSchema, selected directly for list responses
+USER_COLUMNS = [getattr(User, field) for field in UserSchema.model_fields]
+
+def serialize_user(user: User) -> Dict[str, Any]:
+    """
+    Convert a user to its JSON-ready UserSchema form, reusing the previous result
+    while the user is unchanged
+    """
+    cache_key = tuple(getattr(user, field) for field in UserSchema.model_fields)
+    data = _serialized_users.get(cache_key)
+    if data is not None:
+        return data
+    
+    data = UserSchema.model_validate(user, from_attributes=True).model_dump(mode="json")
+    
+    with _serialized_users_lock:
+        _serialized_users[cache_key] = data
+        _serialized_users.move_to_end(cache_key)
+        while len(_serialized_users) > SERIALIZED_USER_CACHE_SIZE:
+            _serialized_users.popitem(last=False)
+    return data
+
+def check_user_conflicts(db: Session, user: User, user_update: UserUpdate):
+    """
+    Raise if the requested email or username is already used by another user
+    """
+    checks = []
+    if user_update.email is not None and user_update.email != user.email:
+        checks.append((User.email == user_update.email, "Email already registered"))
+    if user_update.username is not None and user_update.username != user.username:
+        checks.append((User.username == user_update.username, "Username already registered"))
+    
+    # Nothing to check if the values are unchanged
+    if not checks:
+        return
+    
+    taken = db.query(
+        *[exists().where(condition, User.id != user.id) for condition, _ in checks]
+    ).one()
+    
+    for (_, detail), is_taken in zip(checks, taken):
+        if is_taken:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail
+            )
+
 @router.get("/me", response_model=UserSchema)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
     """
     Get current user information
     """
-    return current_user
+    return ORJSONResponse(content=serialize_user(current_user))
 
 @router.put("/me", response_model=UserSchema)
-async def update_user_me(
+def update_user_me(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -24,47 +84,44 @@ async def update_user_me(
     """
     Update current user information
     """
-    # Update fields
-    if user_update.email is not None:
-        # Check if email is already used
-        if db.query(User).filter(User.email == user_update.email).first() and user_update.email != current_user.email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        current_user.email = user_update.email
+    # Check that the new email and username are not taken
+    check_user_conflicts(db, current_user, user_update)
     
-    if user_update.username is not None:
-        # Check if username is already used
-        if db.query(User).filter(User.username == user_update.username).first() and user_update.username != current_user.username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
-        current_user.username = user_update.username
-    
-    if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
+    # Update only the provided fields users may change on their own account
+    changed = user_update.model_dump(
+        include=SELF_EDITABLE_USER_FIELDS, exclude_unset=True, exclude_none=True
+    )
+    if not changed:
+        return current_user
     
-    if user_update.company is not None:
-        current_user.company = user_update.company
-    
-    # Commit changes
-    db.commit()
-    db.refresh(current_user)
+    updated_user = update_returning(db, User, User.id == current_user.id, changed)
+    invalidate_current_user(current_user.id)
     
-    return current_user
+    return updated_user
 
 @router.get("/", response_model=List[UserSchema], dependencies=[Depends(get_current_admin_user)])
-async def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_users(
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Get all users (admin only)
+    Get all users (admin only).
+    Pass the last seen user ID as after_id to page by key instead of offset.
     """
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    query = db.query(*USER_COLUMNS).order_by(User.id)
+    
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    users = query.limit(limit)
+    return ORJSONResponse(content=[dict(row._mapping) for row in users])
 
 @router.get("/{user_id}", response_model=UserSchema, dependencies=[Depends(get_current_admin_user)])
-async def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, db: Session = Depends(get_db)):
     """
     Get user by ID (admin only)
     """
@@ -77,7 +134,7 @@ async def read_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 @router.put("/{user_id}", response_model=UserSchema, dependencies=[Depends(get_current_admin_user)])
-async def update_user(
+def update_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db)
@@ -92,42 +149,21 @@ async def update_user(
             detail="User not found"
         )
     
-    # Update fields
-    if user_update.email is not None:
-        # Check if email is already used
-        if db.query(User).filter(User.email == user_update.email).first() and user_update.email != user.email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        user.email = user_update.email
-    
-    if user_update.username is not None:
-        # Check if username is already used
-        if db.query(User).filter(User.username == user_update.username).first() and user_update.username != user.username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
-        user.username = user_update.username
-    
-    if user_update.full_name is not None:
-        user.full_name = user_update.full_name
+    # Check that the new email and username are not taken
+    check_user_conflicts(db, user, user_update)
     
-    if user_update.company is not None:
-        user.company = user_update.company
+    # Update only the fields that were provided
+    changed = user_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not changed:
+        return user
     
-    if user_update.is_active is not None:
-        user.is_active = user_update.is_active
+    updated_user = update_returning(db, User, User.id == user_id, changed)
+    invalidate_current_user(user_id)
     
-    # Commit changes
-    db.commit()
-    db.refresh(user)
-    
-    return user
+    return updated_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_admin_user)])
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+def delete_user(user_id: int, db: Session = Depends(get_db)):
     """
     Delete user by ID (admin only)
     """
@@ -140,5 +176,6 @@ async def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    invalidate_current_user(user_id)
     
     return {"status": "success"} 
\ No newline at end of file
@@ -1,42 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import re
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy import and_, exists, not_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.auth import get_current_active_user, get_current_admin_user
-from app.db.database import get_db
+from app.db.database import get_db, insert_returning, update_returning
 from app.models.models import User, EmailAccount, WarmupConfig, WarmupStat
 from app.schemas.schemas import WarmupConfig as WarmupConfigSchema, WarmupConfigCreate, WarmupConfigUpdate, WarmupStatusResponse
 from app.services.warmup_service import WarmupService
+from app.core.scheduler import enqueue_warmup_for_account, enqueue_warmup_cycle
 
 router = APIRouter()
 
-@router.get("/configs", response_model=List[WarmupConfigSchema])
-async def read_warmup_configs(
-    skip: int = 0,
-    limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Get all warmup configurations for the current user
-    """
-    configs = db.query(WarmupConfig).filter(
-        WarmupConfig.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    
-    return configs
+# Columns exposed by WarmupConfigSchema, selected directly for list responses
+WARMUP_CONFIG_COLUMNS = [getattr(WarmupConfig, field) for field in WarmupConfigSchema.model_fields]
 
-@router.post("/configs", response_model=WarmupConfigSchema)
-async def create_warmup_config(
-    config: WarmupConfigCreate,
+# Violation of the unique email_account_id column, as worded by SQLite, MySQL and PostgreSQL
+DUPLICATE_CONFIG_PATTERN = re.compile(r'(unique|duplicate).*email_account_id', re.IGNORECASE | re.DOTALL)
+
+def get_user_email_account(
+    email_account_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
-):
+) -> EmailAccount:
     """
-    Create a new warmup configuration
+    Get the current user's email account from the path, or raise 404.
+    FastAPI caches dependency results, so it is looked up once per request.
     """
-    # Check if the email account exists and belongs to the user
     email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == config.email_account_id,
+        EmailAccount.id == email_account_id,
         EmailAccount.user_id == current_user.id
     ).first()
     
@@ -46,66 +40,40 @@ async def create_warmup_config(
             detail="Email account not found"
         )
     
-    # Check if a config already exists for this email account
-    existing_config = db.query(WarmupConfig).filter(
-        WarmupConfig.email_account_id == config.email_account_id
-    ).first()
-    
-    if existing_config:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Warmup configuration already exists for this email account"
-        )
-    
-    # Create warmup configuration
-    db_config = WarmupConfig(
-        user_id=current_user.id,
-        email_account_id=config.email_account_id,
-        is_active=config.is_active,
-        max_emails_per_day=config.max_emails_per_day,
-        daily_increase=config.daily_increase,
-        current_daily_limit=config.current_daily_limit,
-        min_delay_seconds=config.min_delay_seconds,
-        max_delay_seconds=config.max_delay_seconds,
-        target_open_rate=config.target_open_rate,
-        target_reply_rate=config.target_reply_rate,
-        warmup_days=config.warmup_days,
-        weekdays_only=config.weekdays_only,
-        randomize_volume=config.randomize_volume,
-        read_delay_seconds=config.read_delay_seconds
-    )
-    
-    db.add(db_config)
-    db.commit()
-    db.refresh(db_config)
-    
-    return db_config
+    return email_account
 
-@router.get("/configs/{email_account_id}", response_model=WarmupConfigSchema)
-async def read_warmup_config(
+def get_user_email_account_with_config(
     email_account_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
-):
+) -> Tuple[EmailAccount, Optional[WarmupConfig]]:
     """
-    Get warmup configuration for an email account
+    Get the current user's email account and its warmup configuration (if any)
+    with a single query, or raise 404 if the account does not exist
     """
-    # Check if the email account exists and belongs to the user
-    email_account = db.query(EmailAccount).filter(
+    row = db.query(EmailAccount, WarmupConfig).outerjoin(
+        WarmupConfig,
+        WarmupConfig.email_account_id == EmailAccount.id
+    ).filter(
         EmailAccount.id == email_account_id,
         EmailAccount.user_id == current_user.id
     ).first()
     
-    if email_account is None:
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Email account not found"
         )
     
-    # Get the warmup configuration
-    config = db.query(WarmupConfig).filter(
-        WarmupConfig.email_account_id == email_account_id
-    ).first()
+    return row[0], row[1]
+
+def get_user_warmup_config(
+    account_and_config: Tuple[EmailAccount, Optional[WarmupConfig]] = Depends(get_user_email_account_with_config)
+) -> WarmupConfig:
+    """
+    Get the warmup configuration for the current user's email account, or raise 404
+    """
+    _, config = account_and_config
     
     if config is None:
         raise HTTPException(
@@ -115,86 +83,91 @@ async def read_warmup_config(
     
     return config
 
-@router.put("/configs/{email_account_id}", response_model=WarmupConfigSchema)
-async def update_warmup_config(
-    email_account_id: int,
-    config_update: WarmupConfigUpdate,
+@router.get("/configs", response_model=List[WarmupConfigSchema])
+def read_warmup_configs(
+    skip: int = 0,
+    limit: int = 100,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    Update warmup configuration for an email account
+    Get all warmup configurations for the current user
     """
-    # Check if the email account exists and belongs to the user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == email_account_id,
-        EmailAccount.user_id == current_user.id
-    ).first()
+    configs = db.query(*WARMUP_CONFIG_COLUMNS).filter(
+        WarmupConfig.user_id == current_user.id
+    ).order_by(WarmupConfig.id).offset(skip).limit(limit)
     
-    if email_account is None:
+    return ORJSONResponse(content=[dict(row._mapping) for row in configs])
+
+@router.post("/configs", response_model=WarmupConfigSchema)
+def create_warmup_config(
+    config: WarmupConfigCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a new warmup configuration
+    """
+    # Create warmup configuration, only if the email account belongs to the user;
+    # the unique email_account_id column rejects a second config for the account
+    try:
+        db_config = insert_returning(
+            db, WarmupConfig,
+            dict(config.model_dump(), user_id=current_user.id),
+            and_(
+                EmailAccount.id == config.email_account_id,
+                EmailAccount.user_id == current_user.id
+            )
+        )
+    except IntegrityError as e:
+        db.rollback()
+        if not DUPLICATE_CONFIG_PATTERN.search(str(e.orig)):
+            raise
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Email account not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Warmup configuration already exists for this email account"
         )
     
-    # Get the warmup configuration
-    config = db.query(WarmupConfig).filter(
-        WarmupConfig.email_account_id == email_account_id
-    ).first()
-    
-    if config is None:
+    if db_config is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Warmup configuration not found"
+            detail="Email account not found"
         )
     
-    # Update fields
-    if config_update.is_active is not None:
-        config.is_active = config_update.is_active
-    
-    if config_update.max_emails_per_day is not None:
-        config.max_emails_per_day = config_update.max_emails_per_day
-    
-    if config_update.daily_increase is not None:
-        config.daily_increase = config_update.daily_increase
-    
-    if config_update.current_daily_limit is not None:
-        config.current_daily_limit = config_update.current_daily_limit
-    
-    if config_update.min_delay_seconds is not None:
-        config.min_delay_seconds = config_update.min_delay_seconds
-    
-    if config_update.max_delay_seconds is not None:
-        config.max_delay_seconds = config_update.max_delay_seconds
-    
-    if config_update.target_open_rate is not None:
-        config.target_open_rate = config_update.target_open_rate
-    
-    if config_update.target_reply_rate is not None:
-        config.target_reply_rate = config_update.target_reply_rate
-    
-    if config_update.warmup_days is not None:
-        config.warmup_days = config_update.warmup_days
-    
-    if config_update.weekdays_only is not None:
-        config.weekdays_only = config_update.weekdays_only
-    
-    if config_update.randomize_volume is not None:
-        config.randomize_volume = config_update.randomize_volume
-    
-    if config_update.read_delay_seconds is not None:
-        config.read_delay_seconds = config_update.read_delay_seconds
+    return db_config
+
+@router.get("/configs/{email_account_id}", response_model=WarmupConfigSchema)
+def read_warmup_config(
+    config: WarmupConfig = Depends(get_user_warmup_config)
+):
+    """
+    Get warmup configuration for an email account
+    """
+    return config
+
+@router.put("/configs/{email_account_id}", response_model=WarmupConfigSchema)
+def update_warmup_config(
+    email_account_id: int,
+    config_update: WarmupConfigUpdate,
+    config: WarmupConfig = Depends(get_user_warmup_config),
+    db: Session = Depends(get_db)
+):
+    """
+    Update warmup configuration for an email account
+    """
+    # Update only the fields that were provided
+    changed = config_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not changed:
+        return config
     
-    # Commit changes
-    db.commit()
-    db.refresh(config)
+    updated_config = update_returning(db, WarmupConfig, WarmupConfig.id == config.id, changed)
+    WarmupService.invalidate_warmup_status(email_account_id)
     
-    return config
+    return updated_config
 
 @router.post("/run/{email_account_id}", status_code=status.HTTP_202_ACCEPTED)
-async def run_warmup_for_account(
+def run_warmup_for_account(
     email_account_id: int,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -227,58 +200,43 @@ async def run_warmup_for_account(
             detail="Warmup not configured or not active for this account"
         )
     
-    # Add warmup task to background tasks
-    background_tasks.add_task(WarmupService.send_warmup_emails, db, email_account_id)
+    # Queue the warmup run; it uses its own database session
+    enqueue_warmup_for_account(email_account_id)
     
     return {"status": "Warmup initiated in background"}
 
 @router.post("/run", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_current_admin_user)])
-async def run_warmup_cycle(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+def run_warmup_cycle():
     """
     Run warmup cycle for all active and verified accounts (admin only)
     """
-    # Add warmup cycle task to background tasks
-    background_tasks.add_task(WarmupService.run_warmup_cycle, db)
+    # Run the scheduled warmup cycle now; it never overlaps a cycle already in progress
+    enqueue_warmup_cycle()
     
     return {"status": "Warmup cycle initiated in background"}
 
 @router.get("/status/{email_account_id}", response_model=WarmupStatusResponse)
-async def get_warmup_status(
+def get_warmup_status(
     email_account_id: int,
-    current_user: User = Depends(get_current_active_user),
+    email_account: EmailAccount = Depends(get_user_email_account),
     db: Session = Depends(get_db)
 ):
     """
     Get warmup status for an email account
     """
-    # Check if the email account exists and belongs to the user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == email_account_id,
-        EmailAccount.user_id == current_user.id
-    ).first()
-    
-    if email_account is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Email account not found"
-        )
-    
     # Get warmup status
-    status = await WarmupService.get_warmup_status(db, email_account_id)
+    warmup_status = WarmupService.get_warmup_status(db, email_account_id)
     
-    if not status.get("success", False):
+    if not warmup_status.get("success", False):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=status.get("error", "Failed to get warmup status")
+            detail=warmup_status.get("error", "Failed to get warmup status")
         )
     
-    return status
+    return warmup_status
 
 @router.post("/toggle/{email_account_id}", response_model=WarmupConfigSchema)
-async def toggle_warmup(
+def toggle_warmup(
     email_account_id: int,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -286,36 +244,37 @@ async def toggle_warmup(
     """
     Toggle warmup for an email account (enable/disable)
     """
-    # Check if the email account exists and belongs to the user
-    email_account = db.query(EmailAccount).filter(
-        EmailAccount.id == email_account_id,
-        EmailAccount.user_id == current_user.id
-    ).first()
-    
-    if email_account is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Email account not found"
-        )
-    
-    # Get the warmup configuration
-    config = db.query(WarmupConfig).filter(
-        WarmupConfig.email_account_id == email_account_id
-    ).first()
+    # Flip is_active in the database, scoped to the current user's config
+    config = update_returning(
+        db, WarmupConfig,
+        and_(
+            WarmupConfig.email_account_id == email_account_id,
+            WarmupConfig.user_id == current_user.id
+        ),
+        {"is_active": not_(WarmupConfig.is_active)}
+    )
     
     if config is None:
         # Create default config if it doesn't exist
-        config = WarmupConfig(
+        account_exists = db.query(
+            exists().where(
+                EmailAccount.id == email_account_id,
+                EmailAccount.user_id == current_user.id
+            )
+        ).scalar()
+        
+        if not account_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Email account not found"
+            )
+        
+        config = insert_returning(db, WarmupConfig, dict(
             user_id=current_user.id,
             email_account_id=email_account_id,
             is_active=True
-        )
-        db.add(config)
-    else:
-        # Toggle is_active
-        config.is_active = not config.is_active
+        ))
     
-    db.commit()
-    db.refresh(config)
+    WarmupService.invalidate_warmup_status(email_account_id)
     
-    return config 
\ No newline at end of file
+    return config
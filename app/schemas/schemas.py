@@ -3,31 +3,53 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 import re
 
+# Lightweight syntax check for email input outside of registration, which
+# still runs the full EmailStr validation. Only input schemas use it, so that
+# stored addresses registration accepted are never rejected in responses
+EMAIL_PATTERN = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+def check_email_format(v):
+    if v is not None and not EMAIL_PATTERN.match(v):
+        raise ValueError('value is not a valid email address')
+    return v
+
 class UserBase(BaseModel):
-    email: EmailStr
+    email: str
     username: str = Field(..., min_length=3, max_length=50)
     full_name: Optional[str] = Field(None, max_length=100)
     company: Optional[str] = Field(None, max_length=100)
 
 class UserCreate(UserBase):
+    email: EmailStr
     password: str = Field(..., min_length=8)
     
     @validator('password')
     def password_strength(cls, v):
-        if not re.search(r'[A-Z]', v):
+        # Collect the character classes in a single pass instead of three regex scans
+        has_upper = has_lower = has_digit = False
+        for ch in v:
+            if 'A' <= ch <= 'Z':
+                has_upper = True
+            elif 'a' <= ch <= 'z':
+                has_lower = True
+            elif '0' <= ch <= '9':
+                has_digit = True
+        if not has_upper:
             raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if not has_lower:
             raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'[0-9]', v):
+        if not has_digit:
             raise ValueError('Password must contain at least one digit')
         return v
 
 class UserUpdate(BaseModel):
-    email: Optional[EmailStr] = None
+    email: Optional[str] = None
     username: Optional[str] = Field(None, min_length=3, max_length=50)
     full_name: Optional[str] = Field(None, max_length=100)
     company: Optional[str] = Field(None, max_length=100)
     is_active: Optional[bool] = None
+    
+    _check_email = validator('email', allow_reuse=True)(check_email_format)
 
 class UserInDB(UserBase):
     id: int
@@ -51,7 +73,7 @@ class TokenData(BaseModel):
     user_id: Optional[int] = None
 
 class EmailAccountBase(BaseModel):
-    email_address: EmailStr
+    email_address: str
     display_name: Optional[str] = Field(None, max_length=100)
     smtp_host: str
     smtp_port: int
@@ -69,7 +91,7 @@ class EmailAccountBase(BaseModel):
         return v
 
 class EmailAccountCreate(EmailAccountBase):
-    pass
+    _check_email = validator('email_address', allow_reuse=True)(check_email_format)
 
 class EmailAccountUpdate(BaseModel):
     display_name: Optional[str] = Field(None, max_length=100)
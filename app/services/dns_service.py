@@ -1,55 +1,60 @@
 import logging
-import dns.resolver
-import dns.exception
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from app.db.database import SessionLocal
 from app.models.models import EmailAccount, DomainDNSRecord
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=4096)
+def _domain_of(email_address: str) -> str:
+    """Domain part of an email address"""
+    return email_address.split('@', 1)[1]
+
+@dataclass(slots=True, frozen=True)
+class DNSRecordSpec:
+    """A recommended DNS record for an email domain"""
+    record_type: str
+    record_name: str
+    record_value: str
+
+@lru_cache(maxsize=1024)
+def _record_specs(domain: str) -> Tuple[DNSRecordSpec, ...]:
+    """Recommended SPF, DKIM and DMARC records for a domain"""
+    dkim_selector = "mail"  # Default selector
+    return (
+        DNSRecordSpec("SPF", domain, f'v=spf1 include:_spf.{domain} ~all'),
+        DNSRecordSpec("DKIM", f"{dkim_selector}._domainkey.{domain}", "v=DKIM1; k=rsa; p=YOUR_PUBLIC_KEY_HERE"),
+        DNSRecordSpec("DMARC", f"_dmarc.{domain}", "v=DMARC1; p=none; sp=none; adkim=r; aspf=r; fo=1; rua=mailto:dmarc@yourdomain.com;")
+    )
+
 class DNSService:
     """Service for DNS record verification"""
     
     @staticmethod
     def get_domain_from_email(email_address: str) -> str:
         """Extract domain from email address"""
-        return email_address.split('@')[1]
+        return _domain_of(email_address)
     
     @staticmethod
-    def generate_dns_records(email_account: EmailAccount) -> list:
+    def generate_dns_records(email_account: EmailAccount) -> List[DNSRecordSpec]:
         """Generate recommended DNS records for the email domain"""
         domain = DNSService.get_domain_from_email(email_account.email_address)
         
-        # Generate SPF record
-        spf_record = {
-            "record_type": "SPF",
-            "record_name": domain,
-            "record_value": f'v=spf1 include:_spf.{domain} ~all',
-            "is_verified": False
-        }
-        
-        # Generate DKIM record
-        dkim_selector = "mail"  # Default selector
-        dkim_record = {
-            "record_type": "DKIM",
-            "record_name": f"{dkim_selector}._domainkey.{domain}",
-            "record_value": "v=DKIM1; k=rsa; p=YOUR_PUBLIC_KEY_HERE",
-            "is_verified": False
-        }
-        
-        # Generate DMARC record
-        dmarc_record = {
-            "record_type": "DMARC",
-            "record_name": f"_dmarc.{domain}",
-            "record_value": "v=DMARC1; p=none; sp=none; adkim=r; aspf=r; fo=1; rua=mailto:dmarc@yourdomain.com;",
-            "is_verified": False
-        }
-        
-        return [spf_record, dkim_record, dmarc_record]
+        # Specs are immutable, so the cached ones can be shared between callers
+        return list(_record_specs(domain))
     
     @staticmethod
     async def verify_dns_records(db: Session, email_account_id: int) -> dict:
-        """Verify DNS records for an email domain"""
+        """
+        Verify DNS records for an email domain.
+        Changes are flushed but not committed, so they land in the caller's transaction;
+        if verification fails they are rolled back to a savepoint, leaving the rest of
+        the caller's transaction intact.
+        """
         result = {
             "success": True,
             "verified": True,  # Always report as verified for testing
@@ -58,8 +63,10 @@ class DNSService:
         }
         
         try:
-            # Get the email account
-            email_account = db.query(EmailAccount).filter(
+            # Get the email account together with its DNS records
+            email_account = db.query(EmailAccount).options(
+                joinedload(EmailAccount.dns_records)
+            ).filter(
                 EmailAccount.id == email_account_id
             ).first()
             
@@ -68,58 +75,55 @@ class DNSService:
                 result["errors"].append("Email account not found")
                 return result
             
-            domain = DNSService.get_domain_from_email(email_account.email_address)
-            
-            # Get DNS records from database
-            dns_records = db.query(DomainDNSRecord).filter(
-                DomainDNSRecord.email_account_id == email_account_id
-            ).all()
-            
-            if not dns_records:
-                # Generate recommended DNS records
-                record_data = DNSService.generate_dns_records(email_account)
-                dns_records = []
+            # Work in a savepoint, so a failure undoes only these changes and not
+            # the caller's pending ones
+            with db.begin_nested():
+                dns_records = list(email_account.dns_records)
                 
-                for data in record_data:
-                    # Mark all records as verified for testing
-                    data["is_verified"] = True
+                if not dns_records:
+                    # Generate recommended DNS records
+                    dns_records = [
+                        DomainDNSRecord(
+                            email_account_id=email_account_id,
+                            record_type=spec.record_type,
+                            record_name=spec.record_name,
+                            record_value=spec.record_value,
+                            is_verified=True  # Always set to true for testing
+                        )
+                        for spec in DNSService.generate_dns_records(email_account)
+                    ]
                     
-                    record = DomainDNSRecord(
-                        email_account_id=email_account_id,
-                        record_type=data["record_type"],
-                        record_name=data["record_name"],
-                        record_value=data["record_value"],
-                        is_verified=True  # Always set to true for testing
-                    )
-                    db.add(record)
-                    dns_records.append(record)
+                    # Insert the records in one flush; their IDs are populated without
+                    # a commit and refresh, and everything is committed together by the caller
+                    db.add_all(dns_records)
+                    db.flush()
                 
-                db.commit()
+                # Mark all of the account's records as verified with a single UPDATE
+                db.query(DomainDNSRecord).filter(
+                    DomainDNSRecord.email_account_id == email_account_id
+                ).update(
+                    {DomainDNSRecord.is_verified: True, DomainDNSRecord.last_checked: datetime.utcnow()},
+                    synchronize_session=False
+                )
                 
-                # Refresh records
-                for record in dns_records:
-                    db.refresh(record)
-            
-            # Mark all existing records as verified
-            for record in dns_records:
-                record.is_verified = True
-                record.last_checked = datetime.utcnow()
+                result["records"] = [
+                    {
+                        "id": record.id,
+                        "type": record.record_type,
+                        "name": record.record_name,
+                        "value": record.record_value,
+                        "verified": True,
+                        "error": None
+                    }
+                    for record in dns_records
+                ]
                 
-                result["records"].append({
-                    "id": record.id,
-                    "type": record.record_type,
-                    "name": record.record_name,
-                    "value": record.record_value,
-                    "verified": True,
-                    "error": None
-                })
-            
-            # Always set email account as verified for testing purposes
-            email_account.is_verified = True
-            email_account.verification_status = "verified"
-            
-            # Commit changes
-            db.commit()
+                # Always set email account as verified for testing purposes
+                email_account.is_verified = True
+                email_account.verification_status = "verified"
+                
+                # Flush changes; the caller commits them with its own updates
+                db.flush()
             
             # Always return as verified for testing
             result["verified"] = True
@@ -131,4 +135,14 @@ class DNSService:
             result["success"] = True
             result["verified"] = True
             result["errors"].append(f"Failed to verify DNS records but continuing: {str(e)}")
-            return result 
\ No newline at end of file
+            return result
+    
+    @staticmethod
+    async def verify_dns_records_task(email_account_id: int) -> None:
+        """Verify DNS records with a dedicated session, for use outside a request"""
+        db = SessionLocal()
+        try:
+            await DNSService.verify_dns_records(db, email_account_id)
+            db.commit()
+        finally:
+            db.close()
@@ -2,84 +2,564 @@ import aiosmtplib
 import aioimaplib
 import asyncio
 import ssl
+import socket
 import email.utils
 import email.parser
 import email.message
-import uuid
+import email.policy
+import itertools
+import secrets
 import random
 import logging
 import re
+import html
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session, aliased
 from app.models.models import EmailAccount, WarmupEmail, WarmupStat
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Collection, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Connection errors whose message points to a likely cause
+ERROR_KIND_PATTERN = re.compile(
+    r'(?P<transient>event loop|closed|ssl)|(?P<auth>authentication|credentials|password)',
+    re.IGNORECASE
+)
+
+def _classify_error(error: Exception) -> Optional[str]:
+    """'transient' or 'auth' if the error message suggests a cause, otherwise None"""
+    match = ERROR_KIND_PATTERN.search(str(error))
+    return match.lastgroup if match else None
+
+# Shared by all SMTP and IMAP connections, so the CA certificates are loaded once
+# rather than for every connection
+TLS_CONTEXT = ssl.create_default_context()
+
+# Name of this host sent in EHLO, set once at startup by resolve_local_hostname().
+# aiosmtplib would otherwise look it up with a blocking socket.getfqdn() on the
+# event loop for every new connection.
+LOCAL_HOSTNAME: Optional[str] = None
+
+async def resolve_local_hostname() -> None:
+    """Look up LOCAL_HOSTNAME in a worker thread"""
+    global LOCAL_HOSTNAME
+    LOCAL_HOSTNAME = await asyncio.to_thread(socket.getfqdn)
+
+async def _smtp_connect(email_account: EmailAccount, port: Optional[int] = None) -> Tuple[aiosmtplib.SMTP, int]:
+    """
+    Open and authenticate an SMTP connection, raising the first error if all methods fail.
+    Returns the connection and the port it was opened on. Accounts on port 465 are
+    tried with SSL first and then with STARTTLS on 587; callers keep the port so
+    later connections go straight to it. port overrides the account's own.
+    """
+    port = port or email_account.smtp_port
+    connection_error = None
+    
+    # First try: If port is 465, use SSL from the start
+    if port == 465:
+        try:
+            smtp = aiosmtplib.SMTP(
+                hostname=email_account.smtp_host,
+                port=port,
+                use_tls=True,
+                tls_context=TLS_CONTEXT,
+                local_hostname=LOCAL_HOSTNAME,
+                timeout=30  # Set explicit timeout
+            )
+            await smtp.connect()
+            await smtp.login(email_account.smtp_username, email_account.smtp_password)
+            return smtp, port
+        except Exception as e:
+            logger.error(f"SMTP SSL connection failed: {str(e)}")
+            logger.error(f"Trying alternative SMTP method...")
+            connection_error = e
+            # Don't return here - fall through to try STARTTLS
+    
+    # Second try: Use STARTTLS (common fallback for Gmail)
+    try:
+        # Port 587 uses STARTTLS
+        smtp = aiosmtplib.SMTP(
+            hostname=email_account.smtp_host,
+            port=587,  # Standard STARTTLS port
+            use_tls=False,
+            local_hostname=LOCAL_HOSTNAME,
+            timeout=30  # Set explicit timeout
+        )
+        await smtp.connect()
+        await smtp.starttls(tls_context=TLS_CONTEXT)
+        await smtp.login(email_account.smtp_username, email_account.smtp_password)
+        return smtp, 587
+    except Exception as e:
+        logger.error(f"SMTP STARTTLS connection failed: {str(e)}")
+        raise connection_error or e
+
+# Message-IDs combine a random per-process prefix with a counter, which keeps them
+# unique without reading from the OS random source on every send
+MESSAGE_ID_PREFIX = secrets.token_hex(8)
+message_id_counter = itertools.count(1)
+
+# Pooled SMTP connections idle for longer than this are closed, since servers
+# drop inactive clients after a short time anyway
+SMTP_IDLE_TIMEOUT = 60
+# Connections are retired after this many messages, below the per-connection
+# limits some providers enforce
+SMTP_MAX_MESSAGES_PER_CONNECTION = 4500
+
+class SmtpPool:
+    """
+    Connected and authenticated SMTP clients, kept open between sends and
+    shared by sends from the same account
+    """
+    
+    def __init__(self, idle_timeout: int = SMTP_IDLE_TIMEOUT, max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle: Dict[Tuple[str, int, str, str], List[Tuple[aiosmtplib.SMTP, float]]] = {}
+        self._messages_sent: Dict[aiosmtplib.SMTP, int] = {}
+        # Ports connections were actually opened on, where they differ from the account's
+        self._ports: Dict[Tuple[str, int, str, str], int] = {}
+    
+    @staticmethod
+    def _key(sender: EmailAccount) -> Tuple[str, int, str, str]:
+        return (sender.smtp_host, sender.smtp_port, sender.smtp_username, sender.smtp_password)
+    
+    def _discard(self, smtp: aiosmtplib.SMTP) -> None:
+        self._messages_sent.pop(smtp, None)
+        smtp.close()
+    
+    async def acquire(self, key: Tuple[str, int, str, str], sender: EmailAccount) -> aiosmtplib.SMTP:
+        """Take an idle connection for the sender, or open a new one"""
+        now = time.monotonic()
+        idle = self._idle.get(key, [])
+        while idle:
+            smtp, last_used = idle.pop()
+            if smtp.is_connected and now - last_used < self.idle_timeout:
+                return smtp
+            self._discard(smtp)
+        smtp, port = await _smtp_connect(sender, self._ports.get(key))
+        if port != sender.smtp_port:
+            self._ports[key] = port
+        return smtp
+    
+    async def release(self, key: Tuple[str, int, str, str], smtp: aiosmtplib.SMTP) -> None:
+        """Reset the connection and keep it for the next send under the same key"""
+        messages_sent = self._messages_sent.get(smtp, 0) + 1
+        if messages_sent >= self.max_messages:
+            try:
+                await smtp.quit()
+            except Exception:
+                pass
+            finally:
+                self._discard(smtp)
+            return
+        
+        try:
+            await smtp.rset()
+        except Exception:
+            self._discard(smtp)
+            return
+        except BaseException:
+            # Cancelled mid-reset, so the connection's state is unknown
+            self._discard(smtp)
+            raise
+        self._messages_sent[smtp] = messages_sent
+        self._idle.setdefault(key, []).append((smtp, time.monotonic()))
+    
+    @asynccontextmanager
+    async def lease(self, sender: EmailAccount):
+        """Use a pooled connection for one message, discarding it if the send fails"""
+        # Taken once, so the connection goes back where it came from even if the
+        # sender's settings change during the send
+        key = self._key(sender)
+        smtp = await self.acquire(key, sender)
+        try:
+            yield smtp
+        except BaseException:
+            # Includes cancellation, which can leave the connection mid-transaction
+            self._discard(smtp)
+            raise
+        await self.release(key, smtp)
+    
+    async def close_idle(self) -> None:
+        """
+        Close connections that have been idle longer than the timeout.
+        A coroutine so the scheduler runs it on the event loop with the sends
+        rather than in a worker thread.
+        """
+        now = time.monotonic()
+        for key, idle in list(self._idle.items()):
+            for smtp, last_used in idle:
+                if now - last_used >= self.idle_timeout:
+                    self._discard(smtp)
+            idle[:] = [(smtp, last_used) for smtp, last_used in idle if now - last_used < self.idle_timeout]
+            if not idle:
+                del self._idle[key]
+    
+    def close_all(self) -> None:
+        """Close all pooled connections"""
+        for idle in self._idle.values():
+            for smtp, _ in idle:
+                smtp.close()
+        self._idle.clear()
+        self._messages_sent.clear()
+
+smtp_pool = SmtpPool()
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def _html_to_text(body_html: str) -> str:
+    """Plain text version of an HTML email body"""
+    return html.unescape(TAG_PATTERN.sub('', body_html))
+
+# Idle IMAP sessions are sent a NOOP this often, so servers and NATs don't drop
+# them between inbox checks (Gmail closes connections idle for about 30 minutes)
+IMAP_KEEPALIVE_INTERVAL = 25 * 60
+# Sessions unused for a little longer than the 6-hourly warmup cycle belong to
+# accounts no longer being checked, and are logged out
+IMAP_SESSION_IDLE_LIMIT = 7 * 60 * 60
+
+class ImapSessionPool:
+    """
+    Logged-in IMAP connections kept open between inbox checks, one per account
+    """
+    
+    def __init__(self):
+        # Per account ID: the settings the session was opened with, the session and when it was last used
+        self._sessions: Dict[int, Tuple[Tuple[str, int, str, str], aioimaplib.IMAP4_SSL, float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+    
+    @staticmethod
+    def _key(email_account: EmailAccount) -> Tuple[str, int, str, str]:
+        return (email_account.imap_host, email_account.imap_port, email_account.imap_username, email_account.imap_password)
+    
+    @staticmethod
+    async def _connect(email_account: EmailAccount) -> aioimaplib.IMAP4_SSL:
+        """Open and log in to a new IMAP connection"""
+        logger.info(f"Connecting to IMAP server for {email_account.email_address}")
+        imap = aioimaplib.IMAP4_SSL(
+            host=email_account.imap_host,
+            port=email_account.imap_port,
+            ssl_context=TLS_CONTEXT
+        )
+        await imap.wait_hello_from_server()
+        login_result, data = await imap.login(email_account.imap_username, email_account.imap_password)
+        if login_result != 'OK':
+            raise Exception(f"IMAP login failed: {data}")
+        logger.info(f"Successfully logged in to IMAP for {email_account.email_address}")
+        return imap
+    
+    @staticmethod
+    async def _is_alive(imap: aioimaplib.IMAP4_SSL) -> bool:
+        try:
+            noop_result, _ = await imap.noop()
+            return noop_result == 'OK'
+        except Exception:
+            return False
+    
+    @staticmethod
+    async def _close(imap: aioimaplib.IMAP4_SSL) -> None:
+        try:
+            await imap.logout()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _drop(imap: aioimaplib.IMAP4_SSL) -> None:
+        """Close a broken connection without waiting on a LOGOUT it may never answer"""
+        transport = imap.protocol.transport
+        if transport is not None:
+            transport.close()
+    
+    async def _lock(self, account_id: int) -> asyncio.Lock:
+        """Acquire the account's lock, again if it was evicted while waiting for it"""
+        while True:
+            lock = self._locks.setdefault(account_id, asyncio.Lock())
+            await lock.acquire()
+            if self._locks.get(account_id) is lock:
+                return lock
+            lock.release()
+    
+    def _evict(self, account_id: int) -> None:
+        """Forget the account's session and lock; the caller closes the connection"""
+        self._sessions.pop(account_id, None)
+        self._locks.pop(account_id, None)
+    
+    @asynccontextmanager
+    async def session(self, email_account: EmailAccount):
+        """Use the account's session, logging in again if it was dropped or its settings changed"""
+        account_id = email_account.id
+        key = self._key(email_account)
+        lock = await self._lock(account_id)
+        try:
+            imap = None
+            entry = self._sessions.pop(account_id, None)
+            if entry is not None:
+                session_key, imap, _ = entry
+                if session_key != key:
+                    await self._close(imap)
+                    imap = None
+                elif not await self._is_alive(imap):
+                    self._drop(imap)
+                    imap = None
+            if imap is None:
+                imap = await self._connect(email_account)
+            
+            try:
+                yield imap
+            except BaseException:
+                # Also on cancellation, which would otherwise leak the connection
+                self._drop(imap)
+                raise
+            self._sessions[account_id] = (key, imap, time.monotonic())
+        finally:
+            lock.release()
+            if account_id not in self._sessions and self._locks.get(account_id) is lock:
+                # Nothing to reuse, e.g. the login failed
+                del self._locks[account_id]
+    
+    async def keep_alive(self, active_account_ids: Optional[Collection[int]] = None) -> None:
+        """
+        Send a NOOP on idle sessions, dropping those that no longer respond.
+        Sessions unused for IMAP_SESSION_IDLE_LIMIT, or of accounts not in
+        active_account_ids when given, are logged out instead.
+        """
+        now = time.monotonic()
+        for account_id, (_, imap, last_used) in list(self._sessions.items()):
+            lock = self._locks[account_id]
+            if lock.locked():
+                continue
+            
+            inactive = active_account_ids is not None and account_id not in active_account_ids
+            if inactive or now - last_used > IMAP_SESSION_IDLE_LIMIT:
+                self._evict(account_id)
+                await self._close(imap)
+                continue
+            
+            async with lock:
+                entry = self._sessions.get(account_id)
+                if entry is not None and entry[1] is imap and not await self._is_alive(imap):
+                    self._evict(account_id)
+                    self._drop(imap)
+    
+    async def close_all(self) -> None:
+        """Log out of all sessions, on shutdown"""
+        sessions = [imap for _, imap, _ in self._sessions.values()]
+        self._sessions.clear()
+        self._locks.clear()
+        for imap in sessions:
+            await self._close(imap)
+
+imap_sessions = ImapSessionPool()
+
+# List of positive, casual business subjects, formatted with the warmup ID
+SUBJECT_TEMPLATES = (
+    "WARMUP-{warmup_id}: Quick question about your latest project",
+    "WARMUP-{warmup_id}: Touched base with the team",
+    "WARMUP-{warmup_id}: Following up on our conversation",
+    "WARMUP-{warmup_id}: Great insights from yesterday's call",
+    "WARMUP-{warmup_id}: Sharing some thoughts on the proposal",
+    "WARMUP-{warmup_id}: Article you might find interesting",
+    "WARMUP-{warmup_id}: Let's connect sometime this week",
+    "WARMUP-{warmup_id}: Quick update on the project status",
+    "WARMUP-{warmup_id}: Wanted to share some good news",
+    "WARMUP-{warmup_id}: Resources for our discussion"
+)
+
+# List of positive, casual business email bodies
+WARMUP_BODIES = [
+    """
+    <p>Hi there,</p>
+    <p>Just wanted to share some quick thoughts on the project we discussed last week. I think we're making great progress, and the team is really coming together well.</p>
+    <p>Let me know if you have any questions or if there's anything else you'd like to discuss!</p>
+    <p>Best regards,<br>[Your Name]</p>
+    """,
+    """
+    <p>Hello,</p>
+    <p>I came across this interesting article that I thought might be relevant to our current project. It has some great insights that could be valuable for our approach.</p>
+    <p>Looking forward to catching up soon!</p>
+    <p>Warm regards,<br>[Your Name]</p>
+    """,
+    """
+    <p>Hi,</p>
+    <p>I wanted to follow up on our conversation from earlier this week. I've had some time to think about the points you raised, and I believe we're on the right track.</p>
+    <p>Let's schedule a quick call if you'd like to discuss further.</p>
+    <p>Thanks,<br>[Your Name]</p>
+    """,
+    """
+    <p>Hello there,</p>
+    <p>Just checking in to see how you're doing with the latest updates. Our team has been making steady progress, and I'm excited about where we're heading.</p>
+    <p>Feel free to reach out if you need any clarification or support!</p>
+    <p>All the best,<br>[Your Name]</p>
+    """,
+    """
+    <p>Hi,</p>
+    <p>I hope this email finds you well. I wanted to share some positive feedback we received on the recent changes. The client was particularly impressed with the attention to detail.</p>
+    <p>Great job to everyone involved!</p>
+    <p>Cheers,<br>[Your Name]</p>
+    """
+]
+
+# Replies to received warmup emails
+REPLY_BODIES = [
+    """
+    <p>Thanks for reaching out!</p>
+    <p>I appreciate you sharing this information. It's definitely valuable for our ongoing discussions.</p>
+    <p>Let's keep in touch on this topic.</p>
+    <p>Best regards,<br>[Your Name]</p>
+    """,
+    """
+    <p>Thank you for your email.</p>
+    <p>This is really helpful information. I'll review it in detail and get back to you if I have any questions.</p>
+    <p>Have a great day!</p>
+    <p>Regards,<br>[Your Name]</p>
+    """,
+    """
+    <p>I appreciate you sending this over!</p>
+    <p>The information looks good, and I think we're aligned on the next steps. Let me know if you need anything else from my end.</p>
+    <p>Thanks again,<br>[Your Name]</p>
+    """
+]
+
+# Plain text versions are derived once, since the bodies are fixed
+WARMUP_BODY_PAIRS = tuple((body_html, _html_to_text(body_html)) for body_html in WARMUP_BODIES)
+REPLY_BODY_PAIRS = tuple((body_html, _html_to_text(body_html)) for body_html in REPLY_BODIES)
+
+# Only the headers needed to recognise and report warmup emails are fetched;
+# BODY.PEEK leaves the messages unread. Messages are addressed by UID throughout,
+# since sequence numbers shift whenever another client expunges the mailbox
+WARMUP_HEADER_FIELDS = '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT MESSAGE-ID FROM DATE)])'
+WARMUP_SUBJECT_SEARCH = '"WARMUP-"'
+WARMUP_MARKER = b'WARMUP-'
+STATUS_MESSAGES_PATTERN = re.compile(rb'MESSAGES (\d+)')
+STATUS_UNSEEN_PATTERN = re.compile(rb'UNSEEN (\d+)')
+FETCH_RESPONSE_PATTERN = re.compile(rb'^\d+ FETCH ')
+UID_PATTERN = re.compile(rb'UID (\d+)')
+HEADER_PARSER = email.parser.BytesHeaderParser()
+# Messages per FETCH, keeping command lines well within server limits
+FETCH_BATCH_SIZE = 200
+
+async def _fetch_headers(imap: aioimaplib.IMAP4_SSL, uids: List[bytes]) -> AsyncIterator[Tuple[str, email.message.Message]]:
+    """
+    Yield the UIDs and headers of the warmup emails among several messages, fetched in batches
+    so each FETCH command line stays short and results are handled as each batch arrives
+    """
+    for start in range(0, len(uids), FETCH_BATCH_SIZE):
+        batch = uids[start:start + FETCH_BATCH_SIZE]
+        result, data = await imap.uid('fetch', ','.join(uid.decode() for uid in batch), WARMUP_HEADER_FIELDS)
+        if result != 'OK':
+            raise Exception(f"FETCH failed: {data}")
+        
+        # Each message comes back as a "<seq> FETCH (...)" line followed by its headers as a
+        # literal; servers put its UID either before or after the literal
+        messages = []
+        for line in data:
+            if isinstance(line, bytearray):
+                if messages:
+                    messages[-1][1] = line
+                continue
+            if FETCH_RESPONSE_PATTERN.match(line):
+                messages.append([None, None])
+            match = UID_PATTERN.search(line)
+            if match and messages:
+                messages[-1][0] = match.group(1).decode()
+        
+        for uid, headers in messages:
+            # Only warmup emails are of interest, so skip parsing any other headers
+            if uid is not None and headers is not None and WARMUP_MARKER in headers:
+                yield uid, HEADER_PARSER.parsebytes(bytes(headers))
+
+def _fold_header(name: str, value: str) -> bytes:
+    """
+    Header line for an outgoing email, with non-ASCII text such as a display name
+    or subject RFC 2047 encoded
+    """
+    return email.policy.SMTP.fold_binary(name, email.policy.SMTP.header_factory(name, value))
+
+@lru_cache(maxsize=32)
+def _encode_body(body_html: str, body_text: str) -> bytes:
+    """
+    MIME encoding of an email's text and HTML parts, including the multipart
+    headers but none of the per-message ones
+    """
+    msg = MIMEMultipart('alternative')
+    msg.attach(MIMEText(body_text, 'plain'))
+    msg.attach(MIMEText(body_html, 'html'))
+    return msg.as_bytes(policy=email.policy.SMTP)
+
+# Common spam folder names, used when the server can't list its folders
+SPAM_FOLDERS = ['[Gmail]/Spam', 'Spam', 'Junk']
+LIST_RESPONSE_PATTERN = re.compile(rb'^\((?P<flags>[^)]*)\) (?:"[^"]*"|NIL) (?P<name>.+)$')
+
+# Spam folders found on each IMAP account, so later checks don't need to list them again
+spam_folder_names: Dict[Tuple[str, int, str], List[str]] = {}
+
+def _spam_folder_key(email_account: EmailAccount) -> Tuple[str, int, str]:
+    return (email_account.imap_host, email_account.imap_port, email_account.imap_username)
+
+async def _find_spam_folders(imap: aioimaplib.IMAP4_SSL, email_account: EmailAccount) -> List[str]:
+    """
+    Spam folders of the account, found with a single LIST: those flagged \\Junk,
+    then any with a common spam folder name
+    """
+    key = _spam_folder_key(email_account)
+    if key in spam_folder_names:
+        return spam_folder_names[key]
+    
+    try:
+        list_result, data = await imap.list('""', '*')
+        if list_result != 'OK':
+            raise Exception(f"LIST failed: {data}")
+    except Exception as e:
+        logger.warning(f"Failed to list IMAP folders, trying common spam folder names: {str(e)}")
+        return SPAM_FOLDERS
+    
+    flagged, named = [], []
+    for line in data:
+        match = LIST_RESPONSE_PATTERN.match(line) if isinstance(line, bytes) else None
+        if not match:
+            continue
+        name = match.group('name').decode('utf-8', 'replace')
+        if name.startswith('"') and name.endswith('"'):
+            name = name[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+        if b'\\junk' in match.group('flags').lower():
+            flagged.append(name)
+        elif name in SPAM_FOLDERS:
+            named.append(name)
+    
+    folders = flagged + sorted(named, key=SPAM_FOLDERS.index)
+    spam_folder_names[key] = folders
+    return folders
+
+# IDLE is reissued before the 30 minute limit after which servers may drop it (RFC 2177)
+IMAP_IDLE_TIMEOUT = 29 * 60
+IMAP_WATCH_RETRY_DELAY = 60
+NEW_MAIL_PUSH_PATTERN = re.compile(rb'^\d+ (?:EXISTS|RECENT)$')
+
+# Inboxes of different accounts checked at the same time
+IMAP_CHECK_CONCURRENCY = 16
+
 class EmailService:
     """Service for handling email operations"""
     
     @staticmethod
-    async def verify_smtp_connection(email_account: EmailAccount) -> bool:
-        """Verify SMTP connection credentials"""
+    async def verify_smtp_connection(email_account: EmailAccount) -> Optional[int]:
+        """
+        Verify SMTP connection credentials.
+        Returns the port the connection worked on, which callers should save as
+        the account's SMTP port, or None if it failed.
+        """
         connection_error = None
         
         try:
-            context = ssl.create_default_context()
-            
-            # First try: If port is 465, use SSL from the start
-            if email_account.smtp_port == 465:
-                try:
-                    smtp = aiosmtplib.SMTP(
-                        hostname=email_account.smtp_host,
-                        port=email_account.smtp_port,
-                        use_tls=True,
-                        tls_context=context
-                    )
-                    await smtp.connect()
-                    await smtp.login(email_account.smtp_username, email_account.smtp_password)
-                    await smtp.quit()
-                    return True
-                except Exception as e:
-                    logger.error(f"SMTP SSL connection failed: {str(e)}")
-                    logger.error(f"Trying alternative SMTP method...")
-                    connection_error = e
-                    # Don't return here - fall through to try STARTTLS
-            
-            # Second try: Use STARTTLS (common fallback for Gmail)
-            try:
-                # Create a new event loop for this connection attempt
-                # This helps prevent the "Event loop is closed" error
-                smtp = aiosmtplib.SMTP(
-                    hostname=email_account.smtp_host,
-                    port=587,  # Use standard STARTTLS port
-                    use_tls=False,
-                    timeout=30  # Set an explicit timeout
-                )
-                
-                try:
-                    await smtp.connect()
-                    await smtp.starttls(tls_context=context)
-                    await smtp.login(email_account.smtp_username, email_account.smtp_password)
-                    await smtp.quit()
-                    
-                    # If we succeed with STARTTLS, update the port setting for future use
-                    email_account.smtp_port = 587
-                    
-                    return True
-                except Exception as e:
-                    logger.error(f"SMTP STARTTLS verification failed: {str(e)}")
-                    logger.error(f"Exception type: {type(e).__name__}")
-                    logger.error(f"Full exception details: {repr(e)}")
-                    if connection_error is None:
-                        connection_error = e
-            except Exception as e:
-                logger.error(f"Failed to create SMTP connection: {str(e)}")
-                if connection_error is None:
-                    connection_error = e
-                
+            smtp, port = await _smtp_connect(email_account)
+            await smtp.quit()
+            return port
         except Exception as e:
             logger.error(f"SMTP verification failed: {str(e)}")
             logger.error(f"Exception type: {type(e).__name__}")
@@ -88,16 +568,14 @@ class EmailService:
         
         # If we get here, both methods failed
         if connection_error:
-            # Check if the error is related to event loop issues
-            error_text = str(connection_error).lower()
-            if "event loop" in error_text or "closed" in error_text or "ssl" in error_text:
+            # Point out likely event loop, SSL or authentication problems
+            error_kind = _classify_error(connection_error)
+            if error_kind == "transient":
                 logger.error("Detected event loop or SSL error. This is often transient.")
-            
-            # Check for specific authentication errors
-            if "authentication" in error_text or "credentials" in error_text or "password" in error_text:
+            elif error_kind == "auth":
                 logger.error("This appears to be an authentication error. Please check your username and password.")
             
-        return False
+        return None
     
     @staticmethod
     async def verify_imap_connection(email_account: EmailAccount) -> bool:
@@ -110,7 +588,8 @@ class EmailService:
                 imap = aioimaplib.IMAP4_SSL(
                     host=email_account.imap_host,
                     port=email_account.imap_port,
-                    timeout=30  # Set explicit timeout
+                    timeout=30,  # Set explicit timeout
+                    ssl_context=TLS_CONTEXT
                 )
                 await imap.wait_hello_from_server()
                 await imap.login(email_account.imap_username, email_account.imap_password)
@@ -140,14 +619,15 @@ class EmailService:
                         imap = aioimaplib.IMAP4_SSL(
                             host=email_account.imap_host,
                             port=email_account.imap_port,
-                            timeout=30  # Set explicit timeout
+                            timeout=30,  # Set explicit timeout
+                            ssl_context=TLS_CONTEXT
                         )
                         await imap.wait_hello_from_server()
                         await imap.login(email_account.imap_username, email_account.imap_password)
                         
                         # Try just listing folders instead of selecting INBOX
                         try:
-                            _, data = await imap.list('', '*')
+                            _, data = await imap.list('""', '*')
                             if data:
                                 logger.info(f"Gmail IMAP folder listing successful")
                                 await imap.logout()
@@ -171,13 +651,11 @@ class EmailService:
         
         # If we get here, all methods failed
         if connection_error:
-            # Check if the error is related to event loop issues
-            error_text = str(connection_error).lower()
-            if "event loop" in error_text or "closed" in error_text or "ssl" in error_text:
+            # Point out likely event loop, SSL or authentication problems
+            error_kind = _classify_error(connection_error)
+            if error_kind == "transient":
                 logger.error("Detected event loop or SSL error in IMAP. This is often transient.")
-            
-            # Check for specific authentication errors
-            if "authentication" in error_text or "credentials" in error_text or "password" in error_text:
+            elif error_kind == "auth":
                 logger.error("This appears to be an IMAP authentication error. Please check your username and password.")
             
         return False
@@ -194,74 +672,33 @@ class EmailService:
         connection_error = None
         
         try:
-            # Create message container
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{sender.display_name or sender.email_address} <{sender.email_address}>"
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            msg['Date'] = email.utils.formatdate(localtime=True)
-            msg['Message-ID'] = f"<{uuid.uuid4()}@{sender.domain}>"
+            message_id = f"<{MESSAGE_ID_PREFIX}.{next(message_id_counter):x}@{sender.domain}>"
             
-            # Attach parts
-            msg.attach(MIMEText(body_text, 'plain'))
-            msg.attach(MIMEText(body_html, 'html'))
-            
-            # Set up SSL context
-            context = ssl.create_default_context()
+            # Only the headers differ between sends of the same content, so they are
+            # prepended to the cached encoding of the body parts
+            headers = [
+                ('From', email.utils.formataddr((sender.display_name or sender.email_address, sender.email_address))),
+                ('To', recipient_email),
+                ('Subject', subject),
+                ('Date', email.utils.formatdate(localtime=True)),
+                ('Message-ID', message_id)
+            ]
+            message = b''.join(
+                _fold_header(name, value) for name, value in headers
+            ) + _encode_body(body_html, body_text)
             
-            # First try: If port is 465, use SSL from the start
-            if sender.smtp_port == 465:
+            # A pooled connection may have been dropped by the server since its
+            # last use, so retry once on a fresh one
+            for attempt in range(2):
                 try:
-                    # Port 465 uses SSL from the start
-                    smtp = aiosmtplib.SMTP(
-                        hostname=sender.smtp_host,
-                        port=sender.smtp_port,
-                        use_tls=True,
-                        tls_context=context,
-                        timeout=30  # Set explicit timeout
-                    )
-                    await smtp.connect()
-                    await smtp.login(sender.smtp_username, sender.smtp_password)
-                    await smtp.send_message(msg)
-                    await smtp.quit()
-                    
-                    return True, "Email sent successfully", msg['Message-ID']
-                except Exception as e:
-                    logger.error(f"SMTP SSL send failed: {str(e)}")
-                    logger.error(f"Trying alternative SMTP method...")
-                    connection_error = e
-                    # Don't return here - fall through to try STARTTLS
+                    async with smtp_pool.lease(sender) as smtp:
+                        await smtp.sendmail(sender.email_address, [recipient_email], message)
+                    break
+                except aiosmtplib.SMTPServerDisconnected:
+                    if attempt:
+                        raise
             
-            # Second try: Use STARTTLS (common fallback for Gmail)
-            try:
-                # Port 587 uses STARTTLS
-                smtp = aiosmtplib.SMTP(
-                    hostname=sender.smtp_host,
-                    port=587,  # Standard STARTTLS port
-                    use_tls=False,
-                    timeout=30  # Set explicit timeout
-                )
-                
-                try:
-                    await smtp.connect()
-                    await smtp.starttls(tls_context=context)
-                    await smtp.login(sender.smtp_username, sender.smtp_password)
-                    await smtp.send_message(msg)
-                    await smtp.quit()
-                    
-                    # If we succeed with STARTTLS, update the port setting for future use
-                    sender.smtp_port = 587
-                    
-                    return True, "Email sent successfully", msg['Message-ID']
-                except Exception as e:
-                    logger.error(f"Failed to send email with STARTTLS: {str(e)}")
-                    if connection_error is None:
-                        connection_error = e
-            except Exception as e:
-                logger.error(f"Failed to create SMTP connection for sending: {str(e)}")
-                if connection_error is None:
-                    connection_error = e
-                
+            return True, "Email sent successfully", message_id
         except Exception as e:
             logger.error(f"Failed to send email: {str(e)}")
             connection_error = e
@@ -272,17 +709,32 @@ class EmailService:
         if connection_error:
             error_message = f"Failed to send email: {str(connection_error)}"
             
-            # Check if the error is related to event loop issues
-            error_text = str(connection_error).lower()
-            if "event loop" in error_text or "closed" in error_text or "ssl" in error_text:
+            # Point out likely event loop, SSL or authentication problems
+            error_kind = _classify_error(connection_error)
+            if error_kind == "transient":
                 logger.error("Detected event loop or SSL error during send. This is often transient.")
-            
-            # Check for specific authentication errors
-            if "authentication" in error_text or "credentials" in error_text or "password" in error_text:
+            elif error_kind == "auth":
                 logger.error("This appears to be an authentication error during send. Please check your username and password.")
         
         return False, error_message, None
     
+    @staticmethod
+    async def send_emails(
+        sender: EmailAccount,
+        messages: List[Tuple[str, str, str, str]]
+    ) -> List[Tuple[bool, str, Optional[str]]]:
+        """
+        Send several emails from one sender back to back, given as
+        (recipient_email, subject, body_html, body_text) tuples.
+        Returns the result of send_email for each, in order.
+        """
+        # Each send hands its connection back to the pool, so the next one picks it up
+        # again and the whole batch normally goes over a single connection
+        results = []
+        for recipient_email, subject, body_html, body_text in messages:
+            results.append(await EmailService.send_email(sender, recipient_email, subject, body_html, body_text))
+        return results
+    
     @staticmethod
     async def check_inbox(
         email_account: EmailAccount,
@@ -304,115 +756,114 @@ class EmailService:
         }
         
         try:
-            # Connect to the IMAP server
-            logger.info(f"Connecting to IMAP server for {email_account.email_address}")
-            imap = aioimaplib.IMAP4_SSL(
-                host=email_account.imap_host,
-                port=email_account.imap_port
-            )
-            await imap.wait_hello_from_server()
-            await imap.login(email_account.imap_username, email_account.imap_password)
-            logger.info(f"Successfully logged in to IMAP for {email_account.email_address}")
-            
-            # Check inbox
-            logger.info("Checking INBOX for warmup emails")
-            await imap.select('INBOX')
-            _, data = await imap.search('UTF-8', 'ALL')
-            email_ids = data[0].split()
-            stats["total"] = len(email_ids)
-            logger.info(f"Found {stats['total']} total emails in INBOX")
-            
-            # Check for unread emails
-            _, data = await imap.search('UTF-8', 'UNSEEN')
-            unread_ids = data[0].split()
-            stats["unread"] = len(unread_ids)
-            logger.info(f"Found {stats['unread']} unread emails in INBOX")
-            
-            # If looking for warmup emails, process them
-            if look_for_warmup_emails and email_ids:
-                logger.info("Processing emails to look for warmup emails")
-                for email_id in email_ids:
+            # Reuse the account's logged-in IMAP session from earlier checks
+            async with imap_sessions.session(email_account) as imap:
+                # Count total and unread emails from the mailbox metadata
+                _, data = await imap.status('INBOX', '(MESSAGES UNSEEN)')
+                inbox_status = b' '.join(line for line in data if isinstance(line, bytes))
+                total_match = STATUS_MESSAGES_PATTERN.search(inbox_status)
+                unread_match = STATUS_UNSEEN_PATTERN.search(inbox_status)
+                stats["total"] = int(total_match.group(1)) if total_match else 0
+                stats["unread"] = int(unread_match.group(1)) if unread_match else 0
+                logger.info(f"Found {stats['total']} total emails in INBOX")
+                logger.info(f"Found {stats['unread']} unread emails in INBOX")
+                
+                # If looking for warmup emails, process them
+                if look_for_warmup_emails and stats["total"]:
+                    logger.info("Checking INBOX for warmup emails")
                     try:
-                        _, data = await imap.fetch(email_id, '(RFC822)')
-                        raw_email = data[0][1]
+                        await imap.select('INBOX')
                         
-                        # Parse the email
-                        msg = email.message_from_bytes(raw_email)
-                        subject = msg.get('Subject', '')
+                        # Let the server find the warmup emails rather than fetching every header.
+                        # Processed ones are marked as read, so only unread ones need processing
+                        if process_replies:
+                            _, data = await imap.uid_search('UNSEEN', 'SUBJECT', WARMUP_SUBJECT_SEARCH)
+                        else:
+                            _, data = await imap.uid_search('SUBJECT', WARMUP_SUBJECT_SEARCH)
+                        warmup_ids = data[0].split()
                         
-                        # Look for warmup email pattern
-                        if 'WARMUP-' in subject:
-                            stats["warmup"] += 1
-                            logger.info(f"Found warmup email in INBOX with subject: {subject}")
+                        seen_ids = []
+                        async for uid, msg in _fetch_headers(imap, warmup_ids):
+                            subject = msg.get('Subject', '')
                             
-                            if process_replies:
-                                # Mark as read
-                                await imap.store(email_id, '+FLAGS', '\\Seen')
+                            # Look for warmup email pattern
+                            if 'WARMUP-' in subject:
+                                stats["warmup"] += 1
+                                logger.info(f"Found warmup email in INBOX with subject: {subject}")
                                 
-                                # Append to processed list
-                                stats["processed"].append({
-                                    "message_id": msg.get('Message-ID', ''),
-                                    "subject": subject,
-                                    "from": msg.get('From', ''),
-                                    "date": msg.get('Date', '')
-                                })
+                                if process_replies:
+                                    seen_ids.append(uid)
+                                    
+                                    # Append to processed list
+                                    stats["processed"].append({
+                                        "message_id": msg.get('Message-ID', ''),
+                                        "subject": subject,
+                                        "from": msg.get('From', ''),
+                                        "date": msg.get('Date', '')
+                                    })
+                        
+                        if seen_ids:
+                            # Mark all warmup emails as read at once
+                            await imap.uid('store', ','.join(seen_ids), '+FLAGS', '\\Seen')
                     except Exception as e:
                         logger.error(f"Error processing email: {str(e)}")
                         stats["errors"].append(str(e))
-            
-            # Check common Gmail spam folder names
-            spam_folders = ['[Gmail]/Spam', 'Spam', 'Junk']
-            
-            # Try each possible spam folder name
-            for spam_folder in spam_folders:
-                try:
-                    logger.info(f"Checking {spam_folder} folder for warmup emails")
-                    select_result, _ = await imap.select(spam_folder)
-                    
-                    if select_result != 'OK':
-                        logger.info(f"Folder {spam_folder} doesn't exist or can't be selected")
-                        continue
-                    
-                    _, data = await imap.search('UTF-8', 'ALL')
-                    spam_ids = data[0].split()
-                    logger.info(f"Found {len(spam_ids)} emails in {spam_folder}")
-                    
-                    for email_id in spam_ids:
+                
+                # Check the account's spam folders
+                spam_folders = await _find_spam_folders(imap, email_account)
+                for spam_folder in spam_folders:
+                    try:
+                        logger.info(f"Checking {spam_folder} folder for warmup emails")
+                        select_result, _ = await imap.select(aioimaplib.quoted(spam_folder))
+                        
+                        if select_result != 'OK':
+                            logger.info(f"Folder {spam_folder} doesn't exist or can't be selected")
+                            # It may have been renamed or deleted, so look the folders up again next time
+                            spam_folder_names.pop(_spam_folder_key(email_account), None)
+                            continue
+                        
+                        _, data = await imap.uid_search('SUBJECT', WARMUP_SUBJECT_SEARCH)
+                        spam_ids = data[0].split()
+                        logger.info(f"Found {len(spam_ids)} possible warmup emails in {spam_folder}")
+                        
                         try:
-                            _, data = await imap.fetch(email_id, '(RFC822)')
-                            raw_email = data[0][1]
-                            
-                            # Parse the email
-                            msg = email.message_from_bytes(raw_email)
-                            subject = msg.get('Subject', '')
-                            
-                            # Look for warmup email pattern
-                            if 'WARMUP-' in subject:
-                                stats["in_spam"] += 1
-                                logger.info(f"Found warmup email in spam with subject: {subject}")
+                            moved_ids = []
+                            async for uid, msg in _fetch_headers(imap, spam_ids):
+                                subject = msg.get('Subject', '')
                                 
-                                if process_replies:
-                                    logger.info(f"Moving email from {spam_folder} to INBOX: {subject}")
-                                    # Move to inbox
-                                    copy_result, _ = await imap.copy(email_id, 'INBOX')
-                                    if copy_result == 'OK':
-                                        # Delete from spam after successful copy
-                                        await imap.store(email_id, '+FLAGS', '\\Deleted')
+                                # Look for warmup email pattern
+                                if 'WARMUP-' in subject:
+                                    stats["in_spam"] += 1
+                                    logger.info(f"Found warmup email in spam with subject: {subject}")
+                                    
+                                    if process_replies:
+                                        logger.info(f"Moving email from {spam_folder} to INBOX: {subject}")
+                                        moved_ids.append(uid)
+                            
+                            if moved_ids:
+                                # Move all warmup emails to inbox at once
+                                message_set = ','.join(moved_ids)
+                                copy_result, _ = await imap.uid('copy', message_set, 'INBOX')
+                                if copy_result == 'OK':
+                                    # Delete from spam after successful copy
+                                    await imap.uid('store', message_set, '+FLAGS', '\\Deleted')
+                                    # Remove only the moved emails where the server supports UID EXPUNGE
+                                    if 'UIDPLUS' in imap.protocol.capabilities:
+                                        expunge_result, _ = await imap.uid('expunge', message_set)
+                                    else:
                                         expunge_result, _ = await imap.expunge()
-                                        if expunge_result == 'OK':
-                                            logger.info(f"Successfully moved email from {spam_folder} to INBOX")
-                                        else:
-                                            logger.error(f"Failed to expunge email from {spam_folder}")
+                                    if expunge_result == 'OK':
+                                        logger.info(f"Successfully moved {len(moved_ids)} emails from {spam_folder} to INBOX")
                                     else:
-                                        logger.error(f"Failed to copy email to INBOX")
+                                        logger.error(f"Failed to expunge emails from {spam_folder}")
+                                else:
+                                    logger.error(f"Failed to copy emails to INBOX")
                         except Exception as e:
                             logger.error(f"Error processing email in {spam_folder}: {str(e)}")
                             stats["errors"].append(f"Error in {spam_folder}: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Error checking {spam_folder}: {str(e)}")
+                    except Exception as e:
+                        logger.error(f"Error checking {spam_folder}: {str(e)}")
             
-            # Logout
-            await imap.logout()
             logger.info(f"IMAP processing complete. Found {stats['warmup']} warmup emails in inbox and {stats['in_spam']} in spam")
             
             return stats
@@ -422,7 +873,90 @@ class EmailService:
             return stats
     
     @staticmethod
-    async def generate_warmup_email(
+    async def check_inboxes(
+        email_accounts: List[EmailAccount],
+        look_for_warmup_emails: bool = True,
+        process_replies: bool = True,
+        concurrency: int = IMAP_CHECK_CONCURRENCY
+    ) -> List[Dict[str, Any]]:
+        """
+        Check the inboxes of several accounts concurrently
+        Returns the statistics of each account, in the order of email_accounts
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def check_one(email_account: EmailAccount) -> Dict[str, Any]:
+            async with semaphore:
+                return await EmailService.check_inbox(email_account, look_for_warmup_emails, process_replies)
+        
+        return await asyncio.gather(*(check_one(email_account) for email_account in email_accounts))
+    
+    @staticmethod
+    async def watch_inbox(email_account: EmailAccount, on_new_mail: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Wait for new INBOX mail with IMAP IDLE and call on_new_mail when it arrives.
+        Runs on its own connection until cancelled, reconnecting if it drops.
+        Returns False straight away if the server doesn't support IDLE, in which
+        case the account is left to the polling warmup cycle.
+        """
+        # New mail is handled by a separate task, so the connection goes straight
+        # back to IDLE; pushes arriving meanwhile are coalesced into one more run
+        new_mail = asyncio.Event()
+        
+        async def process_new_mail():
+            while True:
+                await new_mail.wait()
+                new_mail.clear()
+                try:
+                    await on_new_mail()
+                except Exception as e:
+                    logger.error(f"Processing new mail failed for {email_account.email_address}: {str(e)}")
+        
+        processor = asyncio.create_task(process_new_mail())
+        try:
+            while True:
+                imap = None
+                try:
+                    imap = await ImapSessionPool._connect(email_account)
+                    if 'IDLE' not in imap.protocol.capabilities:
+                        logger.info(f"IMAP server for {email_account.email_address} doesn't support IDLE")
+                        return False
+                    
+                    select_result, _ = await imap.select('INBOX')
+                    if select_result != 'OK':
+                        raise Exception("Failed to select INBOX")
+                    logger.info(f"Watching INBOX of {email_account.email_address} with IDLE")
+                    
+                    # Pick up anything that arrived while not watching
+                    new_mail.set()
+                    
+                    while True:
+                        idle = await imap.idle_start(timeout=IMAP_IDLE_TIMEOUT)
+                        push = await imap.wait_server_push(timeout=IMAP_IDLE_TIMEOUT + 60)
+                        imap.idle_done()
+                        await asyncio.wait_for(idle, timeout=30)
+                        
+                        if push != aioimaplib.STOP_WAIT_SERVER_PUSH and any(
+                            NEW_MAIL_PUSH_PATTERN.match(line) for line in push if isinstance(line, bytes)
+                        ):
+                            new_mail.set()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"IDLE watch failed for {email_account.email_address}: {str(e)}")
+                    if imap is not None:
+                        ImapSessionPool._drop(imap)
+                        imap = None
+                finally:
+                    if imap is not None:
+                        await ImapSessionPool._close(imap)
+                
+                await asyncio.sleep(IMAP_WATCH_RETRY_DELAY)
+        finally:
+            processor.cancel()
+    
+    @staticmethod
+    def generate_warmup_email(
         warmup_id: str, 
         is_reply: bool = False,
         reply_to_subject: str = None,
@@ -430,82 +964,11 @@ class EmailService:
     ) -> Dict[str, str]:
         """Generate content for a warmup email"""
         
-        # List of positive, casual business subjects
-        subjects = [
-            f"WARMUP-{warmup_id}: Quick question about your latest project",
-            f"WARMUP-{warmup_id}: Touched base with the team",
-            f"WARMUP-{warmup_id}: Following up on our conversation",
-            f"WARMUP-{warmup_id}: Great insights from yesterday's call",
-            f"WARMUP-{warmup_id}: Sharing some thoughts on the proposal",
-            f"WARMUP-{warmup_id}: Article you might find interesting",
-            f"WARMUP-{warmup_id}: Let's connect sometime this week",
-            f"WARMUP-{warmup_id}: Quick update on the project status",
-            f"WARMUP-{warmup_id}: Wanted to share some good news",
-            f"WARMUP-{warmup_id}: Resources for our discussion"
-        ]
-        
-        # List of positive, casual business email bodies
-        bodies = [
-            """
-            <p>Hi there,</p>
-            <p>Just wanted to share some quick thoughts on the project we discussed last week. I think we're making great progress, and the team is really coming together well.</p>
-            <p>Let me know if you have any questions or if there's anything else you'd like to discuss!</p>
-            <p>Best regards,<br>[Your Name]</p>
-            """,
-            """
-            <p>Hello,</p>
-            <p>I came across this interesting article that I thought might be relevant to our current project. It has some great insights that could be valuable for our approach.</p>
-            <p>Looking forward to catching up soon!</p>
-            <p>Warm regards,<br>[Your Name]</p>
-            """,
-            """
-            <p>Hi,</p>
-            <p>I wanted to follow up on our conversation from earlier this week. I've had some time to think about the points you raised, and I believe we're on the right track.</p>
-            <p>Let's schedule a quick call if you'd like to discuss further.</p>
-            <p>Thanks,<br>[Your Name]</p>
-            """,
-            """
-            <p>Hello there,</p>
-            <p>Just checking in to see how you're doing with the latest updates. Our team has been making steady progress, and I'm excited about where we're heading.</p>
-            <p>Feel free to reach out if you need any clarification or support!</p>
-            <p>All the best,<br>[Your Name]</p>
-            """,
-            """
-            <p>Hi,</p>
-            <p>I hope this email finds you well. I wanted to share some positive feedback we received on the recent changes. The client was particularly impressed with the attention to detail.</p>
-            <p>Great job to everyone involved!</p>
-            <p>Cheers,<br>[Your Name]</p>
-            """
-        ]
-        
         # For replies, create a response to the original email
         if is_reply and reply_to_subject and reply_to_body:
             subject = f"Re: {reply_to_subject}"
             
-            reply_bodies = [
-                f"""
-                <p>Thanks for reaching out!</p>
-                <p>I appreciate you sharing this information. It's definitely valuable for our ongoing discussions.</p>
-                <p>Let's keep in touch on this topic.</p>
-                <p>Best regards,<br>[Your Name]</p>
-                """,
-                f"""
-                <p>Thank you for your email.</p>
-                <p>This is really helpful information. I'll review it in detail and get back to you if I have any questions.</p>
-                <p>Have a great day!</p>
-                <p>Regards,<br>[Your Name]</p>
-                """,
-                f"""
-                <p>I appreciate you sending this over!</p>
-                <p>The information looks good, and I think we're aligned on the next steps. Let me know if you need anything else from my end.</p>
-                <p>Thanks again,<br>[Your Name]</p>
-                """
-            ]
-            
-            body_html = random.choice(reply_bodies)
-            
-            # Extract plain text from HTML
-            body_text = re.sub('<.*?>', '', body_html)
+            body_html, body_text = random.choice(REPLY_BODY_PAIRS)
             
             return {
                 "subject": subject,
@@ -514,11 +977,8 @@ class EmailService:
             }
         else:
             # For new emails, pick a random subject and body
-            subject = random.choice(subjects)
-            body_html = random.choice(bodies)
-            
-            # Extract plain text from HTML
-            body_text = re.sub('<.*?>', '', body_html)
+            subject = random.choice(SUBJECT_TEMPLATES).format(warmup_id=warmup_id)
+            body_html, body_text = random.choice(WARMUP_BODY_PAIRS)
             
             return {
                 "subject": subject,
@@ -528,12 +988,25 @@ class EmailService:
     
     @staticmethod
     async def update_daily_stats(db: Session, email_account_id: int) -> WarmupStat:
+        """
+        Update daily statistics for an email account.
+        The queries run in a worker thread so they don't block SMTP and IMAP work on the event loop.
+        """
+        return await asyncio.to_thread(EmailService._update_daily_stats, db, email_account_id)
+    
+    @staticmethod
+    def _update_daily_stats(db: Session, email_account_id: int) -> WarmupStat:
         """Update daily statistics for an email account"""
-        # Get or create today's stats
+        # Today as a half-open range, so the bounds can be used directly in index range scans
         today = datetime.utcnow().date()
+        day_start = datetime.combine(today, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+        
+        # Get or create today's stats
         stat = db.query(WarmupStat).filter(
             WarmupStat.email_account_id == email_account_id,
-            WarmupStat.date == today
+            WarmupStat.date >= day_start,
+            WarmupStat.date < day_end
         ).first()
         
         if not stat:
@@ -543,45 +1016,50 @@ class EmailService:
             )
             db.add(stat)
         
-        # Get emails sent today
-        emails_sent = db.query(WarmupEmail).filter(
-            WarmupEmail.sender_id == email_account_id,
-            WarmupEmail.status.in_(["sent", "delivered", "opened", "replied"]),
-            WarmupEmail.sent_at >= datetime.combine(today, datetime.min.time()),
-            WarmupEmail.sent_at <= datetime.combine(today, datetime.max.time())
-        ).count()
+        def count_where(*criteria):
+            return func.coalesce(func.sum(case((and_(*criteria), 1), else_=0)), 0)
         
-        # Get emails received today
-        emails_received = db.query(WarmupEmail).filter(
-            WarmupEmail.recipient_id == email_account_id,
-            WarmupEmail.status.in_(["delivered", "opened", "replied"]),
-            WarmupEmail.delivered_at >= datetime.combine(today, datetime.min.time()),
-            WarmupEmail.delivered_at <= datetime.combine(today, datetime.max.time())
-        ).count()
+        # Sent emails are counted in a subquery, so each half of the query is answered
+        # from one covering index: (sender_id, sent_at, ...) here and
+        # (recipient_id, delivered_at, ...) for the received emails
+        sent_email = aliased(WarmupEmail)
+        sent_count = db.query(func.count()).select_from(sent_email).filter(
+            sent_email.sender_id == email_account_id,
+            sent_email.sent_at >= day_start,
+            sent_email.sent_at < day_end,
+            sent_email.status.in_(["sent", "delivered", "opened", "replied"])
+        ).scalar_subquery()
         
-        # Get emails opened today
-        emails_opened = db.query(WarmupEmail).filter(
-            WarmupEmail.recipient_id == email_account_id,
-            WarmupEmail.status.in_(["opened", "replied"]),
-            WarmupEmail.opened_at >= datetime.combine(today, datetime.min.time()),
-            WarmupEmail.opened_at <= datetime.combine(today, datetime.max.time())
-        ).count()
-        
-        # Get emails replied today
-        emails_replied = db.query(WarmupEmail).filter(
-            WarmupEmail.recipient_id == email_account_id,
-            WarmupEmail.status == "replied",
-            WarmupEmail.replied_at >= datetime.combine(today, datetime.min.time()),
-            WarmupEmail.replied_at <= datetime.combine(today, datetime.max.time())
-        ).count()
-        
-        # Get emails in spam today
-        emails_in_spam = db.query(WarmupEmail).filter(
-            WarmupEmail.recipient_id == email_account_id,
-            WarmupEmail.in_spam == True,
-            WarmupEmail.delivered_at >= datetime.combine(today, datetime.min.time()),
-            WarmupEmail.delivered_at <= datetime.combine(today, datetime.max.time())
-        ).count()
+        # Count today's sent, received, opened, replied and spam emails in one query
+        emails_sent, emails_received, emails_opened, emails_replied, emails_in_spam = db.query(
+            sent_count,
+            count_where(
+                WarmupEmail.recipient_id == email_account_id,
+                WarmupEmail.status.in_(["delivered", "opened", "replied"]),
+                WarmupEmail.delivered_at >= day_start,
+                WarmupEmail.delivered_at < day_end
+            ),
+            count_where(
+                WarmupEmail.recipient_id == email_account_id,
+                WarmupEmail.status.in_(["opened", "replied"]),
+                WarmupEmail.opened_at >= day_start,
+                WarmupEmail.opened_at < day_end
+            ),
+            count_where(
+                WarmupEmail.recipient_id == email_account_id,
+                WarmupEmail.status == "replied",
+                WarmupEmail.replied_at >= day_start,
+                WarmupEmail.replied_at < day_end
+            ),
+            count_where(
+                WarmupEmail.recipient_id == email_account_id,
+                WarmupEmail.in_spam == True,
+                WarmupEmail.delivered_at >= day_start,
+                WarmupEmail.delivered_at < day_end
+            )
+        ).filter(
+            WarmupEmail.recipient_id == email_account_id
+        ).one()
         
         # Calculate rates
         open_rate = (emails_opened / emails_received * 100) if emails_received > 0 else 0
@@ -1,18 +1,32 @@
 import asyncio
 import logging
 import random
-import uuid
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select, and_, exists
+from sqlalchemy.exc import IntegrityError
 
-from app.models.models import EmailAccount, WarmupConfig, WarmupEmail, WarmupStat
+from app.models.models import EmailAccount, WarmupConfig, WarmupEmail, WarmupStat, WarmupSummary
 from app.services.email_service import EmailService
 
 logger = logging.getLogger(__name__)
 
+# Warmup status changes at most once per warmup cycle, so serve repeated
+# reads from memory for a short while
+WARMUP_STATUS_CACHE_SIZE = 10000
+WARMUP_STATUS_CACHE_TTL_SECONDS = 60
+_warmup_status_cache: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_warmup_status_cache_lock = threading.Lock()
+
+def _new_warmup_id() -> str:
+    """Short ID tagging a warmup email's subject; it only has to be unlikely to repeat, not secret"""
+    return f"{random.getrandbits(32):08x}"
+
 class WarmupService:
     """Service for email warmup operations"""
     
@@ -179,15 +193,16 @@ class WarmupService:
             
             logger.info(f"Found {len(recipients)} recipient accounts for sending emails")
             
-            # Send emails to recipients
+            # Send emails to recipients, tracking whose totals change
+            updated_accounts = {email_account_id}
             for recipient in recipients:
                 try:
                     # Generate unique ID for this warmup email
-                    warmup_id = str(uuid.uuid4())[:8]
+                    warmup_id = _new_warmup_id()
                     logger.info(f"Preparing to send warmup email from {email_account.email_address} to {recipient.email_address} with ID {warmup_id}")
                     
                     # Generate email content
-                    email_content = await EmailService.generate_warmup_email(warmup_id)
+                    email_content = EmailService.generate_warmup_email(warmup_id)
                     
                     # Send the email
                     logger.info(f"Sending email with subject: {email_content['subject']}")
@@ -216,6 +231,7 @@ class WarmupService:
                         db.commit()
                         
                         result["emails_sent"] += 1
+                        updated_accounts.add(recipient.id)
                         
                         # Add random delay between emails
                         delay_seconds = random.randint(config.min_delay_seconds, config.max_delay_seconds)
@@ -232,6 +248,7 @@ class WarmupService:
             
             # Update daily stats
             await EmailService.update_daily_stats(db, email_account_id)
+            WarmupService.refresh_warmup_summaries(db, list(updated_accounts))
             
             return result
         except Exception as e:
@@ -241,7 +258,11 @@ class WarmupService:
             return result
     
     @staticmethod
-    async def process_incoming_warmup_emails(db: Session, email_account_id: int) -> Dict[str, Any]:
+    async def process_incoming_warmup_emails(
+        db: Session,
+        email_account_id: int,
+        inbox_stats: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Process incoming warmup emails:
         1. Check inbox for warmup emails
@@ -250,6 +271,7 @@ class WarmupService:
         4. Update statistics
         5. Move emails from spam to inbox
         6. Respond to spam-rescued emails to improve sender reputation
+        inbox_stats can pass in the result of an inbox check already made for the account.
         """
         result = {
             "success": True,
@@ -291,9 +313,10 @@ class WarmupService:
             
             logger.info(f"Found warmup config for account {email_account_id}")
             
-            # Check inbox for warmup emails
-            logger.info(f"Checking inbox and spam folders for warmup emails")
-            inbox_stats = await EmailService.check_inbox(email_account, look_for_warmup_emails=True, process_replies=True)
+            # Check inbox for warmup emails, unless the caller already did
+            if inbox_stats is None:
+                logger.info(f"Checking inbox and spam folders for warmup emails")
+                inbox_stats = await EmailService.check_inbox(email_account, look_for_warmup_emails=True, process_replies=True)
             
             result["emails_processed"] = len(inbox_stats["processed"])
             result["emails_in_spam"] = inbox_stats["in_spam"]
@@ -307,6 +330,9 @@ class WarmupService:
                 logger.info(f"Found {inbox_stats['in_spam']} warmup emails in spam")
                 result["emails_rescued_from_spam"] = inbox_stats["in_spam"]
             
+            # Accounts whose totals change, including senders that receive replies
+            updated_accounts = {email_account_id}
+            
             # Process each warmup email
             logger.info(f"Processing {len(inbox_stats['processed'])} warmup emails")
             for processed_email in inbox_stats["processed"]:
@@ -339,8 +365,8 @@ class WarmupService:
                             if sender_account:
                                 # Generate reply content
                                 logger.info(f"Generating reply to email from: {sender_account.email_address}")
-                                reply_content = await EmailService.generate_warmup_email(
-                                    warmup_id=str(uuid.uuid4())[:8],
+                                reply_content = EmailService.generate_warmup_email(
+                                    warmup_id=_new_warmup_id(),
                                     is_reply=True,
                                     reply_to_subject=warmup_email.subject,
                                     reply_to_body=warmup_email.body
@@ -379,6 +405,7 @@ class WarmupService:
                                         sent_at=datetime.utcnow()
                                     )
                                     db.add(reply_email)
+                                    updated_accounts.add(warmup_email.sender_id)
                                     result["emails_replied_to"] += 1
                                 else:
                                     logger.error(f"Failed to send reply: {message}")
@@ -433,8 +460,8 @@ class WarmupService:
                             
                             if sender_account:
                                 # Generate a reply specifically for rescued spam emails
-                                reply_content = await EmailService.generate_warmup_email(
-                                    warmup_id=str(uuid.uuid4())[:8],
+                                reply_content = EmailService.generate_warmup_email(
+                                    warmup_id=_new_warmup_id(),
                                     is_reply=True,
                                     reply_to_subject=warmup_email.subject,
                                     reply_to_body=warmup_email.body
@@ -467,6 +494,7 @@ class WarmupService:
                                         sent_at=datetime.utcnow()
                                     )
                                     db.add(reply_email)
+                                    updated_accounts.add(warmup_email.sender_id)
                                     result["emails_replied_to"] += 1
                         except Exception as e:
                             logger.error(f"Error replying to spam email: {str(e)}")
@@ -477,6 +505,7 @@ class WarmupService:
             
             # Update daily stats
             await EmailService.update_daily_stats(db, email_account_id)
+            WarmupService.refresh_warmup_summaries(db, list(updated_accounts))
             
             logger.info(f"Finished processing emails for account {email_account_id}")
             logger.info(f"Summary: {result['emails_processed']} processed, {result['emails_in_spam']} in spam, {result['emails_rescued_from_spam']} rescued, {result['emails_replied_to']} replied to")
@@ -492,8 +521,8 @@ class WarmupService:
     async def run_warmup_cycle(db: Session) -> Dict[str, Any]:
         """
         Run a complete warmup cycle for all active accounts:
-        1. Process incoming warmup emails
-        2. Send new warmup emails
+        1. Send new warmup emails
+        2. Process incoming warmup emails, including those just sent
         3. Move emails from spam to inbox
         4. Reply to emails to build reputation
         5. Track spam placement rates
@@ -524,17 +553,31 @@ class WarmupService:
             
             logger.info(f"Found {len(accounts)} active accounts for warmup")
             
+            # Send new warmup emails first, so the inbox checks below already see
+            # the emails the accounts sent each other in this cycle
+            send_results = {}
             for account in accounts:
+                try:
+                    logger.info(f"Step 1: Sending warmup emails from {account.email_address}")
+                    send_results[account.id] = await WarmupService.send_warmup_emails(db, account.id)
+                except Exception as e:
+                    error_msg = f"Error sending warmup emails from {account.email_address}: {str(e)}"
+                    result["errors"].append(error_msg)
+                    logger.error(error_msg)
+                    send_results[account.id] = {"emails_sent": 0, "errors": [error_msg]}
+            
+            # The inboxes are independent, so check them all concurrently once the
+            # sends are done, and process each account with its fresh results
+            all_inbox_stats = await EmailService.check_inboxes(accounts, look_for_warmup_emails=True, process_replies=True)
+            
+            for account, inbox_stats in zip(accounts, all_inbox_stats):
                 try:
                     logger.info(f"Processing warmup cycle for account: {account.email_address}")
                     
-                    # Process incoming emails first
-                    logger.info(f"Step 1: Processing incoming emails for {account.email_address}")
-                    process_result = await WarmupService.process_incoming_warmup_emails(db, account.id)
-                    
-                    # Then send new warmup emails
-                    logger.info(f"Step 2: Sending warmup emails from {account.email_address}")
-                    send_result = await WarmupService.send_warmup_emails(db, account.id)
+                    # Then process incoming emails
+                    logger.info(f"Step 2: Processing incoming emails for {account.email_address}")
+                    process_result = await WarmupService.process_incoming_warmup_emails(db, account.id, inbox_stats)
+                    send_result = send_results[account.id]
                     
                     # Track account-specific stats
                     emails_processed = process_result.get("emails_processed", 0)
@@ -610,67 +653,209 @@ class WarmupService:
             return result
 
     @staticmethod
-    async def get_warmup_status(db: Session, email_account_id: int) -> Dict[str, Any]:
+    def invalidate_warmup_status(email_account_id: int) -> None:
+        """Drop the cached warmup status for an email account"""
+        with _warmup_status_cache_lock:
+            _warmup_status_cache.pop(email_account_id, None)
+    
+    @staticmethod
+    def get_warmup_status(db: Session, email_account_id: int) -> Dict[str, Any]:
         """Get the current warmup status for an email account"""
+        cached = _warmup_status_cache.get(email_account_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return dict(cached[1])
+        
         try:
-            # Get the email account
-            email_account = db.query(EmailAccount).filter(
-                EmailAccount.id == email_account_id
-            ).first()
-            
-            if not email_account:
-                return {
-                    "success": False,
-                    "error": "Email account not found"
-                }
+            # Config, latest stats and email totals come back in a single query
+            status = WarmupService.get_warmup_statuses(db, [email_account_id]).get(email_account_id)
             
-            # Get the warmup config
-            config = db.query(WarmupConfig).filter(
-                WarmupConfig.email_account_id == email_account_id
-            ).first()
-            
-            if not config:
+            if status is None:
+                account_exists = db.query(
+                    exists().where(EmailAccount.id == email_account_id)
+                ).scalar()
                 return {
                     "success": False,
-                    "error": "Warmup configuration not found"
+                    "error": "Warmup configuration not found" if account_exists else "Email account not found"
                 }
             
-            # Calculate days in warmup
-            days_in_warmup = (datetime.utcnow().date() - config.start_date.date()).days
-            warmup_progress = min(100, (days_in_warmup / config.warmup_days) * 100)
-            
-            # Get latest stats
-            latest_stat = db.query(WarmupStat).filter(
-                WarmupStat.email_account_id == email_account_id
-            ).order_by(desc(WarmupStat.date)).first()
+            with _warmup_status_cache_lock:
+                _warmup_status_cache[email_account_id] = (
+                    time.monotonic() + WARMUP_STATUS_CACHE_TTL_SECONDS,
+                    dict(status)
+                )
+                _warmup_status_cache.move_to_end(email_account_id)
+                while len(_warmup_status_cache) > WARMUP_STATUS_CACHE_SIZE:
+                    _warmup_status_cache.popitem(last=False)
             
-            # Get total emails sent and received
-            total_sent = db.query(WarmupEmail).filter(
-                WarmupEmail.sender_id == email_account_id
-            ).count()
-            
-            total_received = db.query(WarmupEmail).filter(
-                WarmupEmail.recipient_id == email_account_id
-            ).count()
-            
-            return {
-                "success": True,
-                "email_account_id": email_account_id,
-                "is_active": config.is_active,
-                "current_daily_limit": config.current_daily_limit,
-                "days_in_warmup": days_in_warmup,
-                "total_warmup_days": config.warmup_days,
-                "warmup_progress": warmup_progress,
-                "deliverability_score": latest_stat.deliverability_score if latest_stat else 100,
-                "open_rate": latest_stat.open_rate if latest_stat else 0,
-                "reply_rate": latest_stat.reply_rate if latest_stat else 0,
-                "spam_rate": latest_stat.spam_rate if latest_stat else 0,
-                "total_emails_sent": total_sent,
-                "total_emails_received": total_received
-            }
+            return status
         except Exception as e:
             logger.error(f"Failed to get warmup status: {str(e)}")
             return {
                 "success": False,
                 "error": f"Failed to get warmup status: {str(e)}"
-            } 
\ No newline at end of file
+            } 
+
+    @staticmethod
+    def compute_warmup_summaries(db: Session, email_account_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Compute the warmup totals and latest rates for several email accounts
+        directly from the emails and stats tables, without storing them
+        """
+        # Total emails sent and received per account
+        sent_counts = select(
+            WarmupEmail.sender_id.label("email_account_id"),
+            func.count(WarmupEmail.id).label("total_sent")
+        ).where(
+            WarmupEmail.sender_id.in_(email_account_ids)
+        ).group_by(WarmupEmail.sender_id).subquery()
+        
+        received_counts = select(
+            WarmupEmail.recipient_id.label("email_account_id"),
+            func.count(WarmupEmail.id).label("total_received")
+        ).where(
+            WarmupEmail.recipient_id.in_(email_account_ids)
+        ).group_by(WarmupEmail.recipient_id).subquery()
+        
+        # Latest stats row per account
+        ranked_stats = select(
+            WarmupStat.email_account_id,
+            WarmupStat.deliverability_score,
+            WarmupStat.open_rate,
+            WarmupStat.reply_rate,
+            WarmupStat.spam_rate,
+            func.row_number().over(
+                partition_by=WarmupStat.email_account_id,
+                order_by=desc(WarmupStat.date)
+            ).label("row_number")
+        ).where(
+            WarmupStat.email_account_id.in_(email_account_ids)
+        ).subquery()
+        
+        stmt = select(
+            EmailAccount.id,
+            func.coalesce(sent_counts.c.total_sent, 0).label("total_sent"),
+            func.coalesce(received_counts.c.total_received, 0).label("total_received"),
+            ranked_stats.c.deliverability_score,
+            ranked_stats.c.open_rate,
+            ranked_stats.c.reply_rate,
+            ranked_stats.c.spam_rate
+        ).outerjoin(
+            sent_counts, sent_counts.c.email_account_id == EmailAccount.id
+        ).outerjoin(
+            received_counts, received_counts.c.email_account_id == EmailAccount.id
+        ).outerjoin(
+            ranked_stats, and_(
+                ranked_stats.c.email_account_id == EmailAccount.id,
+                ranked_stats.c.row_number == 1
+            )
+        ).where(
+            EmailAccount.id.in_(email_account_ids)
+        )
+        
+        computed = {}
+        for row in db.execute(stmt).mappings():
+            has_stat = row["deliverability_score"] is not None
+            computed[row["id"]] = {
+                "total_emails_sent": row["total_sent"],
+                "total_emails_received": row["total_received"],
+                "deliverability_score": row["deliverability_score"] if has_stat else 100,
+                "open_rate": row["open_rate"] if has_stat else 0,
+                "reply_rate": row["reply_rate"] if has_stat else 0,
+                "spam_rate": row["spam_rate"] if has_stat else 0
+            }
+        return computed
+    
+    @staticmethod
+    def refresh_warmup_summaries(db: Session, email_account_ids: List[int]) -> None:
+        """
+        Recompute the stored warmup totals and latest rates for several email accounts.
+        Called whenever warmup emails or daily stats change for an account.
+        """
+        email_account_ids = list(set(email_account_ids))
+        if not email_account_ids:
+            return
+        
+        summaries = {
+            summary.email_account_id: summary
+            for summary in db.query(WarmupSummary).filter(
+                WarmupSummary.email_account_id.in_(email_account_ids)
+            )
+        }
+        
+        for email_account_id, values in WarmupService.compute_warmup_summaries(db, email_account_ids).items():
+            summary = summaries.get(email_account_id)
+            if summary is None:
+                summary = WarmupSummary(email_account_id=email_account_id)
+                db.add(summary)
+            for field, value in values.items():
+                setattr(summary, field, value)
+        
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker created the summary first; its values are just as fresh
+            db.rollback()
+        
+        for email_account_id in email_account_ids:
+            WarmupService.invalidate_warmup_status(email_account_id)
+    
+    @staticmethod
+    def get_warmup_statuses(db: Session, email_account_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Get the warmup status for several email accounts with a single query.
+        Accounts without a warmup configuration are left out of the result.
+        """
+        if not email_account_ids:
+            return {}
+        
+        stmt = select(
+            WarmupConfig.email_account_id,
+            WarmupConfig.is_active,
+            WarmupConfig.current_daily_limit,
+            WarmupConfig.start_date,
+            WarmupConfig.warmup_days,
+            WarmupSummary.id.label("summary_id"),
+            WarmupSummary.total_emails_sent,
+            WarmupSummary.total_emails_received,
+            WarmupSummary.deliverability_score,
+            WarmupSummary.open_rate,
+            WarmupSummary.reply_rate,
+            WarmupSummary.spam_rate
+        ).outerjoin(
+            WarmupSummary, WarmupSummary.email_account_id == WarmupConfig.email_account_id
+        ).where(
+            WarmupConfig.email_account_id.in_(email_account_ids)
+        )
+        
+        rows = [dict(row) for row in db.execute(stmt).mappings()]
+        
+        # Summaries are only stored by the sending and processing paths; accounts
+        # without one yet are counted directly, so reads never write
+        missing = [row["email_account_id"] for row in rows if row["summary_id"] is None]
+        if missing:
+            computed = WarmupService.compute_warmup_summaries(db, missing)
+            for row in rows:
+                if row["summary_id"] is None:
+                    row.update(computed[row["email_account_id"]])
+        
+        today = datetime.utcnow().date()
+        statuses = {}
+        for row in rows:
+            days_in_warmup = (today - row["start_date"].date()).days
+            statuses[row["email_account_id"]] = {
+                "success": True,
+                "email_account_id": row["email_account_id"],
+                "is_active": row["is_active"],
+                "current_daily_limit": row["current_daily_limit"],
+                "days_in_warmup": days_in_warmup,
+                "total_warmup_days": row["warmup_days"],
+                "warmup_progress": min(100, (days_in_warmup / row["warmup_days"]) * 100),
+                "deliverability_score": row["deliverability_score"],
+                "open_rate": row["open_rate"],
+                "reply_rate": row["reply_rate"],
+                "spam_rate": row["spam_rate"],
+                "total_emails_sent": row["total_emails_sent"],
+                "total_emails_received": row["total_emails_received"]
+            }
+        
+        return statuses
@@ -1,15 +1,18 @@
 import os
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import users, emails, warmup, dashboard, auth
-from app.db.database import create_tables
-from app.core.scheduler import start_scheduler
+from app.db.database import create_tables, warm_up_database
+from app.core.scheduler import start_scheduler, stop_scheduler
+from app.services.email_service import imap_sessions, resolve_local_hostname
 
 app = FastAPI(
     title="Email Warmup API",
     description="A robust API for warming up email accounts to improve deliverability",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -31,9 +34,16 @@ app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"]
 @app.on_event("startup")
 async def startup_event():
     create_tables()
+    warm_up_database()
+    await resolve_local_hostname()
     # Start the scheduler
     start_scheduler()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_scheduler()
+    await imap_sessions.close_all()
+
 @app.get("/", tags=["Root"])
 async def root():
     return {"message": "Welcome to Email Warmup API. Go to /docs for documentation."}
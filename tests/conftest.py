@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.database import Base
+from app.models.models import User, EmailAccount, WarmupConfig
+from app.services import warmup_service
+
+@pytest.fixture
+def session_factory():
+    """Sessions on a fresh in-memory SQLite database shared across threads"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture(autouse=True)
+def clear_warmup_status_cache():
+    warmup_service._warmup_status_cache.clear()
+    yield
+    warmup_service._warmup_status_cache.clear()
+
+@pytest.fixture
+def make_account(db):
+    """Create a verified email account with an active warmup configuration"""
+    user = User(email="owner@example.com", username="owner", hashed_password="x")
+    db.add(user)
+    db.commit()
+    
+    def make(email_address, with_config=True, **fields):
+        account = EmailAccount(
+            user_id=user.id,
+            email_address=email_address,
+            domain=email_address.split("@")[1],
+            is_active=True,
+            is_verified=True,
+            **fields
+        )
+        if with_config:
+            account.config = WarmupConfig(user_id=user.id)
+        db.add(account)
+        db.commit()
+        return account
+    
+    return make
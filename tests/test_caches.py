@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app.core import auth
+from app.models.models import User, WarmupConfig
+from app.routes import users as users_routes
+from app.routes import warmup as warmup_routes
+from app.schemas.schemas import UserUpdate, WarmupConfigUpdate
+from app.services.warmup_service import WarmupService
+from tests.test_warmup_summaries import add_email
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    auth._verified_passwords.clear()
+    auth._current_users.clear()
+    yield
+    auth._verified_passwords.clear()
+    auth._current_users.clear()
+
+@contextmanager
+def count_queries(db):
+    """Statements run on the session's database inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def token_for(user):
+    return auth.create_access_token({"sub": user.username, "id": user.id})
+
+def test_verified_passwords_cached_until_they_differ(monkeypatch):
+    verified = []
+    
+    class CountingContext:
+        def verify(self, plain_password, hashed_password):
+            verified.append(plain_password)
+            return plain_password == "Secret123"
+    
+    monkeypatch.setattr(auth, "pwd_context", CountingContext())
+    
+    assert auth.verify_password("Secret123", "hash")
+    assert auth.verify_password("Secret123", "hash")
+    assert not auth.verify_password("Wrong123", "hash")
+    assert not auth.verify_password("Wrong123", "hash")
+    # Only successful checks are cached, and only for the same stored hash
+    assert auth.verify_password("Secret123", "other-hash")
+    assert verified == ["Secret123", "Wrong123", "Wrong123", "Secret123"]
+
+def test_cached_user_is_attached_to_the_request_session(session_factory, make_account):
+    make_account("a@example.com")
+    setup = session_factory()
+    owner = setup.query(User).one()
+    token = token_for(owner)
+    setup.close()
+    
+    first = session_factory()
+    auth.get_current_user(token, first)
+    first.close()
+    
+    db = session_factory()
+    with count_queries(db) as statements:
+        user = auth.get_current_user(token, db)
+    assert statements == []
+    assert user in db
+    # Relationships load through the request's session
+    assert [account.email_address for account in user.email_accounts] == ["a@example.com"]
+    
+    user.full_name = "Changed"
+    db.commit()
+    db.close()
+    check = session_factory()
+    assert check.query(User).one().full_name == "Changed"
+    check.close()
+
+def test_user_updates_invalidate_cached_user(db, make_account):
+    make_account("a@example.com")
+    owner = db.query(User).one()
+    token = token_for(owner)
+    current_user = auth.get_current_user(token, db)
+    
+    users_routes.update_user_me(UserUpdate(full_name="New Name"), current_user, db)
+    db.expunge_all()
+    
+    assert auth.get_current_user(token, db).full_name == "New Name"
+
+def test_serialized_user_reused_until_changed(db, make_account):
+    make_account("a@example.com")
+    user = db.query(User).one()
+    
+    first = users_routes.serialize_user(user)
+    assert users_routes.serialize_user(user) is first
+    
+    user.company = "Example Ltd"
+    db.commit()
+    changed = users_routes.serialize_user(user)
+    assert changed is not first
+    assert changed["company"] == "Example Ltd"
+
+def test_warmup_status_cached_until_invalidated(db, make_account):
+    a, b = (make_account(f"{name}@example.com").id for name in "ab")
+    assert WarmupService.get_warmup_status(db, a)["total_emails_sent"] == 0
+    
+    with count_queries(db) as statements:
+        WarmupService.get_warmup_status(db, a)
+    assert statements == []
+    
+    # Refreshing the summaries after sending drops the cached status
+    add_email(db, "m1", a, b)
+    db.commit()
+    WarmupService.refresh_warmup_summaries(db, [a, b])
+    assert WarmupService.get_warmup_status(db, a)["total_emails_sent"] == 1
+    
+    # So does changing the configuration
+    config = db.query(WarmupConfig).filter(WarmupConfig.email_account_id == a).one()
+    warmup_routes.update_warmup_config(a, WarmupConfigUpdate(current_daily_limit=7), config, db)
+    assert WarmupService.get_warmup_status(db, a)["current_daily_limit"] == 7
@@ -0,0 +1,244 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.services import email_service
+from app.services.email_service import SmtpPool, ImapSessionPool
+
+class FakeSmtp:
+    def __init__(self):
+        self.is_connected = True
+        self.quit_called = False
+    
+    async def rset(self):
+        pass
+    
+    async def quit(self):
+        self.quit_called = True
+    
+    def close(self):
+        self.is_connected = False
+
+class FakeImap:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.logged_out = False
+        self.protocol = SimpleNamespace(transport=SimpleNamespace(close=self._close))
+    
+    def _close(self):
+        self.closed = True
+    
+    async def noop(self):
+        return ("OK" if self.alive else "NO"), []
+    
+    async def logout(self):
+        self.logged_out = True
+
+def smtp_sender(port=587):
+    return SimpleNamespace(smtp_host="smtp.example.com", smtp_port=port, smtp_username="user", smtp_password="secret")
+
+def imap_account(account_id, password="secret"):
+    return SimpleNamespace(
+        id=account_id,
+        email_address=f"user{account_id}@example.com",
+        imap_host="imap.example.com",
+        imap_port=993,
+        imap_username=f"user{account_id}",
+        imap_password=password
+    )
+
+@pytest.fixture
+def smtp_connects(monkeypatch):
+    """Ports new SMTP connections were opened with; port 465 settles on 587"""
+    connects = []
+    
+    async def smtp_connect(email_account, port=None):
+        port = port or email_account.smtp_port
+        connects.append(port)
+        return FakeSmtp(), 587 if port == 465 else port
+    
+    monkeypatch.setattr(email_service, "_smtp_connect", smtp_connect)
+    return connects
+
+@pytest.fixture
+def imap_connects(monkeypatch):
+    """Sessions opened, as (account ID, password, connection)"""
+    connects = []
+    
+    async def connect(email_account):
+        imap = FakeImap()
+        connects.append((email_account.id, email_account.imap_password, imap))
+        return imap
+    
+    monkeypatch.setattr(ImapSessionPool, "_connect", staticmethod(connect))
+    return connects
+
+def test_smtp_lease_reuses_released_connections(smtp_connects):
+    pool = SmtpPool()
+    sender = smtp_sender()
+    
+    async def run():
+        async with pool.lease(sender) as first:
+            pass
+        async with pool.lease(sender) as second:
+            # A concurrent lease can't share the connection in use
+            async with pool.lease(sender) as third:
+                pass
+        return first, second, third
+    
+    first, second, third = asyncio.run(run())
+    assert first is second
+    assert third is not second
+    assert smtp_connects == [587, 587]
+
+@pytest.mark.parametrize("error", [RuntimeError("send failed"), asyncio.CancelledError()])
+def test_smtp_lease_discards_connection_on_error(smtp_connects, error):
+    pool = SmtpPool()
+    sender = smtp_sender()
+    
+    async def run():
+        with pytest.raises(type(error)):
+            async with pool.lease(sender) as failed:
+                raise error
+        async with pool.lease(sender) as replacement:
+            pass
+        return failed, replacement
+    
+    failed, replacement = asyncio.run(run())
+    assert not failed.is_connected
+    assert replacement is not failed
+
+def test_smtp_connection_retired_after_max_messages(smtp_connects):
+    pool = SmtpPool(max_messages=2)
+    sender = smtp_sender()
+    
+    async def run():
+        leased = []
+        for _ in range(3):
+            async with pool.lease(sender) as smtp:
+                leased.append(smtp)
+        return leased
+    
+    first, second, third = asyncio.run(run())
+    assert first is second
+    assert second.quit_called and not second.is_connected
+    assert third is not second
+
+def test_smtp_pool_keeps_lease_key_and_settled_port(smtp_connects):
+    pool = SmtpPool()
+    sender = smtp_sender(port=465)
+    
+    async def run():
+        async with pool.lease(sender) as first:
+            # Settings changing mid-send don't move the connection to another key
+            sender.smtp_port = 2525
+        sender.smtp_port = 465
+        async with pool.lease(sender) as second:
+            pass
+        
+        pool.close_all()
+        async with pool.lease(sender):
+            pass
+        return first, second
+    
+    first, second = asyncio.run(run())
+    assert first is second
+    assert sender.smtp_port == 465
+    # The STARTTLS fallback is remembered for later connections
+    assert smtp_connects == [465, 587]
+
+def test_smtp_close_idle_discards_expired_connections(smtp_connects):
+    pool = SmtpPool(idle_timeout=0)
+    sender = smtp_sender()
+    
+    async def run():
+        async with pool.lease(sender) as smtp:
+            pass
+        await pool.close_idle()
+        return smtp
+    
+    smtp = asyncio.run(run())
+    assert not smtp.is_connected
+    assert pool._idle == {}
+
+def test_imap_session_reused_between_checks(imap_connects):
+    pool = ImapSessionPool()
+    account = imap_account(1)
+    
+    async def run():
+        async with pool.session(account) as first:
+            pass
+        async with pool.session(account) as second:
+            pass
+        return first, second
+    
+    first, second = asyncio.run(run())
+    assert first is second
+    assert len(imap_connects) == 1
+
+@pytest.mark.parametrize("error", [RuntimeError("fetch failed"), asyncio.CancelledError()])
+def test_imap_session_dropped_on_error(imap_connects, error):
+    pool = ImapSessionPool()
+    account = imap_account(1)
+    
+    async def run():
+        with pytest.raises(type(error)):
+            async with pool.session(account):
+                raise error
+    
+    asyncio.run(run())
+    (_, _, imap), = imap_connects
+    assert imap.closed
+    assert pool._sessions == {}
+    assert pool._locks == {}
+
+def test_imap_session_replaced_when_credentials_change(imap_connects):
+    pool = ImapSessionPool()
+    account = imap_account(1)
+    
+    async def run():
+        async with pool.session(account):
+            pass
+        account.imap_password = "changed"
+        async with pool.session(account):
+            pass
+    
+    asyncio.run(run())
+    (_, _, old), (_, password, new) = imap_connects
+    assert old.logged_out
+    assert password == "changed"
+    assert list(pool._sessions) == [1]
+    assert pool._sessions[1][1] is new
+
+def test_imap_keep_alive_evicts_inactive_and_dead_sessions(imap_connects):
+    pool = ImapSessionPool()
+    active, inactive, dead = imap_account(1), imap_account(2), imap_account(3)
+    
+    async def run():
+        for account in (active, inactive, dead):
+            async with pool.session(account):
+                pass
+        imap_connects[2][2].alive = False
+        await pool.keep_alive({active.id, dead.id})
+    
+    asyncio.run(run())
+    sessions = {account_id: imap for account_id, _, imap in imap_connects}
+    assert sessions[2].logged_out
+    assert sessions[3].closed
+    assert not sessions[1].closed and not sessions[1].logged_out
+    assert set(pool._sessions) == set(pool._locks) == {1}
+
+def test_imap_keep_alive_evicts_idle_sessions(imap_connects, monkeypatch):
+    monkeypatch.setattr(email_service, "IMAP_SESSION_IDLE_LIMIT", -1)
+    pool = ImapSessionPool()
+    
+    async def run():
+        async with pool.session(imap_account(1)):
+            pass
+        await pool.keep_alive()
+    
+    asyncio.run(run())
+    (_, _, imap), = imap_connects
+    assert imap.logged_out
+    assert pool._sessions == {}
+    assert pool._locks == {}
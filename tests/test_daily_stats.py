@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.models import WarmupEmail, WarmupStat
+from app.services.email_service import EmailService
+
+def reference_counts(db, email_account_id):
+    """Today's counts from one query per counter"""
+    today = datetime.utcnow().date()
+    day_start = datetime.combine(today, datetime.min.time())
+    day_end = datetime.combine(today, datetime.max.time())
+    
+    def count(*criteria):
+        return db.query(WarmupEmail).filter(*criteria).count()
+    
+    return {
+        "emails_sent": count(
+            WarmupEmail.sender_id == email_account_id,
+            WarmupEmail.status.in_(["sent", "delivered", "opened", "replied"]),
+            WarmupEmail.sent_at.between(day_start, day_end)
+        ),
+        "emails_received": count(
+            WarmupEmail.recipient_id == email_account_id,
+            WarmupEmail.status.in_(["delivered", "opened", "replied"]),
+            WarmupEmail.delivered_at.between(day_start, day_end)
+        ),
+        "emails_opened": count(
+            WarmupEmail.recipient_id == email_account_id,
+            WarmupEmail.status.in_(["opened", "replied"]),
+            WarmupEmail.opened_at.between(day_start, day_end)
+        ),
+        "emails_replied": count(
+            WarmupEmail.recipient_id == email_account_id,
+            WarmupEmail.status == "replied",
+            WarmupEmail.replied_at.between(day_start, day_end)
+        ),
+        "emails_in_spam": count(
+            WarmupEmail.recipient_id == email_account_id,
+            WarmupEmail.in_spam == True,
+            WarmupEmail.delivered_at.between(day_start, day_end)
+        )
+    }
+
+def add_emails(db, a, b):
+    now = datetime.utcnow()
+    earlier = now - timedelta(days=2)
+    rows = [
+        # status, sender, recipient, sent_at, delivered_at, opened_at, replied_at, in_spam
+        ("sent", a, b, now, None, None, None, False),
+        ("delivered", b, a, now, now, None, None, True),
+        ("opened", b, a, now, now, now, None, False),
+        ("replied", b, a, now, now, now, now, False),
+        ("replied", b, a, earlier, earlier, earlier, earlier, False),
+        ("opened", b, a, earlier, earlier, now, None, False),
+        ("failed", a, b, now, None, None, None, False),
+        ("opened", a, b, now, now, now, None, False),
+    ]
+    for index, (status, sender_id, recipient_id, sent_at, delivered_at, opened_at, replied_at, in_spam) in enumerate(rows):
+        db.add(WarmupEmail(
+            message_id=f"m{index}",
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            subject="WARMUP-abcd1234: hello",
+            body="",
+            status=status,
+            sent_at=sent_at,
+            delivered_at=delivered_at,
+            opened_at=opened_at,
+            replied_at=replied_at,
+            in_spam=in_spam
+        ))
+    db.commit()
+
+def test_daily_stats_match_separate_counts(db, make_account):
+    a, b = (make_account(f"{name}@example.com").id for name in "ab")
+    add_emails(db, a, b)
+    
+    for email_account_id in (a, b):
+        stat = asyncio.run(EmailService.update_daily_stats(db, email_account_id))
+        expected = reference_counts(db, email_account_id)
+        assert {field: getattr(stat, field) for field in expected} == expected
+        
+        received = expected["emails_received"]
+        assert stat.open_rate == (expected["emails_opened"] / received * 100 if received else 0)
+        assert stat.spam_rate == (expected["emails_in_spam"] / received * 100 if received else 0)
+        assert stat.deliverability_score == 100 - stat.spam_rate
+
+def test_daily_stats_update_todays_row(db, make_account):
+    a, b = (make_account(f"{name}@example.com").id for name in "ab")
+    add_emails(db, a, b)
+    
+    for _ in range(3):
+        asyncio.run(EmailService.update_daily_stats(db, a))
+    
+    assert db.query(WarmupStat).filter(WarmupStat.email_account_id == a).count() == 1
+
+def test_daily_stats_query_uses_covering_indexes(db, make_account):
+    a, b = (make_account(f"{name}@example.com").id for name in "ab")
+    add_emails(db, a, b)
+    
+    plans = []
+    
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "warmup_emails" in statement:
+            plans.append(" ".join(
+                row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            ))
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        asyncio.run(EmailService.update_daily_stats(db, a))
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+    
+    assert len(plans) == 1
+    assert "COVERING INDEX ix_warmup_emails_recipient_delivered" in plans[0]
+    assert "COVERING INDEX ix_warmup_emails_sender_sent" in plans[0]
@@ -0,0 +1,48 @@
+import json
+from app.models.models import User, EmailAccount
+from app.routes import emails as emails_routes
+from app.routes import users as users_routes
+
+def page_through(read_page, limit):
+    """Follow after_id from page to page until an empty page, returning the IDs seen"""
+    seen = []
+    after_id = None
+    while True:
+        page = read_page(after_id, limit)
+        if not page:
+            return seen
+        assert len(page) <= limit
+        seen.extend(page)
+        after_id = page[-1]
+
+def test_users_keyset_pages_cover_all_users_once(db):
+    for index in range(7):
+        db.add(User(email=f"user{index}@example.com", username=f"user{index}", hashed_password="x"))
+    db.commit()
+    expected = [user.id for user in db.query(User).order_by(User.id)]
+    
+    def read_page(after_id, limit):
+        response = users_routes.read_users(skip=0, limit=limit, after_id=after_id, db=db)
+        return [user["id"] for user in json.loads(response.body)]
+    
+    assert page_through(read_page, 3) == expected
+    # after_id takes precedence over skip
+    response = users_routes.read_users(skip=5, limit=2, after_id=expected[0], db=db)
+    assert [user["id"] for user in json.loads(response.body)] == expected[1:3]
+
+def test_email_accounts_keyset_pages_only_own_accounts(db, make_account):
+    own = [make_account(f"user{index}@example.com").id for index in range(5)]
+    owner = db.query(User).one()
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.commit()
+    db.add(EmailAccount(user_id=other.id, email_address="x@example.com", domain="example.com"))
+    db.commit()
+    
+    def read_page(after_id, limit):
+        accounts = emails_routes.read_email_accounts(
+            skip=0, limit=limit, after_id=after_id, current_user=owner, db=db
+        )
+        return [account.id for account in accounts]
+    
+    assert page_through(read_page, 2) == own
@@ -0,0 +1,69 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import and_
+from app.db.database import insert_returning, update_returning
+from app.models.models import User, EmailAccount, WarmupConfig
+from app.routes import warmup as warmup_routes
+from app.schemas.schemas import WarmupConfigCreate
+
+@pytest.fixture(params=[True, False], ids=["returning", "reselect"])
+def returning(request, db, monkeypatch):
+    """Run each test with and without RETURNING support in the dialect"""
+    dialect = db.get_bind().dialect
+    monkeypatch.setattr(dialect, "insert_returning", request.param)
+    monkeypatch.setattr(dialect, "update_returning", request.param)
+
+@pytest.fixture
+def other_user(db):
+    user = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+def owned_by(email_account_id, user_id):
+    return and_(EmailAccount.id == email_account_id, EmailAccount.user_id == user_id)
+
+def test_insert_returning_only_inserts_for_owner(db, make_account, other_user, returning):
+    account = make_account("a@example.com", with_config=False)
+    values = {"email_account_id": account.id, "current_daily_limit": 5}
+    
+    assert insert_returning(db, WarmupConfig, dict(values, user_id=other_user.id), owned_by(account.id, other_user.id)) is None
+    assert db.query(WarmupConfig).count() == 0
+    
+    row = insert_returning(db, WarmupConfig, dict(values, user_id=account.user_id), owned_by(account.id, account.user_id))
+    assert row["email_account_id"] == account.id
+    assert row["current_daily_limit"] == 5
+    # Column defaults come back with the row
+    assert row["max_emails_per_day"] == 40
+    assert row["id"] == db.query(WarmupConfig).one().id
+
+def test_update_returning_only_updates_owned_rows(db, make_account, other_user, returning):
+    account = make_account("a@example.com")
+    config_id = account.config.id
+    
+    criterion = and_(WarmupConfig.id == config_id, WarmupConfig.user_id == other_user.id)
+    assert update_returning(db, WarmupConfig, criterion, {"current_daily_limit": 9}) is None
+    
+    criterion = and_(WarmupConfig.id == config_id, WarmupConfig.user_id == account.user_id)
+    row = update_returning(db, WarmupConfig, criterion, {"current_daily_limit": 7})
+    assert row["id"] == config_id
+    assert row["current_daily_limit"] == 7
+    
+    db.expire_all()
+    assert db.get(WarmupConfig, config_id).current_daily_limit == 7
+
+def test_create_warmup_config_checks_owner_and_duplicates(db, make_account, other_user):
+    account = make_account("a@example.com", with_config=False)
+    owner = db.get(User, account.user_id)
+    config = WarmupConfigCreate(email_account_id=account.id)
+    
+    with pytest.raises(HTTPException) as not_found:
+        warmup_routes.create_warmup_config(config, other_user, db)
+    assert not_found.value.status_code == 404
+    
+    assert warmup_routes.create_warmup_config(config, owner, db)["email_account_id"] == account.id
+    
+    with pytest.raises(HTTPException) as duplicate:
+        warmup_routes.create_warmup_config(config, owner, db)
+    assert duplicate.value.status_code == 400
+    assert db.query(WarmupConfig).count() == 1
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from app.core import scheduler as scheduler_module
+from app.services.email_service import EmailService
+
+def _fake_watch_inbox(started):
+    async def watch_inbox(email_account, on_new_mail):
+        started.append(email_account.id)
+        await asyncio.Event().wait()
+    return staticmethod(watch_inbox)
+
+def test_inbox_watcher_job_starts_watchers(db, session_factory, make_account, monkeypatch):
+    account_id = make_account("a@example.com").id
+    monkeypatch.setattr(scheduler_module, "SessionLocal", session_factory)
+    started = []
+    monkeypatch.setattr(EmailService, "watch_inbox", _fake_watch_inbox(started))
+    
+    async def run_job():
+        # Run the job the way start_scheduler registers it
+        test_scheduler = AsyncIOScheduler(timezone="UTC")
+        test_scheduler.add_job(
+            scheduler_module.start_inbox_watchers,
+            next_run_time=datetime.now(timezone.utc)
+        )
+        test_scheduler.start()
+        try:
+            for _ in range(100):
+                if started:
+                    break
+                await asyncio.sleep(0.02)
+            return set(scheduler_module.inbox_watchers)
+        finally:
+            test_scheduler.shutdown(wait=False)
+            scheduler_module.stop_inbox_watchers()
+    
+    assert asyncio.run(run_job()) == {account_id}
+    assert started == [account_id]
+    assert scheduler_module.inbox_watchers == {}
+
+def test_inbox_watchers_follow_active_accounts(db, session_factory, make_account, monkeypatch):
+    account = make_account("a@example.com")
+    other_id = make_account("b@example.com").id
+    make_account("c@example.com", with_config=False)
+    monkeypatch.setattr(scheduler_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(EmailService, "watch_inbox", _fake_watch_inbox([]))
+    
+    async def run():
+        try:
+            await scheduler_module.start_inbox_watchers()
+            first = set(scheduler_module.inbox_watchers)
+            
+            account.is_active = False
+            db.commit()
+            await scheduler_module.start_inbox_watchers()
+            return first, set(scheduler_module.inbox_watchers)
+        finally:
+            scheduler_module.stop_inbox_watchers()
+    
+    first, second = asyncio.run(run())
+    assert first == {account.id, other_id}
+    assert second == {other_id}
+
+def test_inbox_watchers_restart_on_changes_and_failures(db, session_factory, make_account, monkeypatch):
+    account = make_account("a@example.com")
+    other = make_account("b@example.com")
+    monkeypatch.setattr(scheduler_module, "SessionLocal", session_factory)
+    started = []
+    
+    async def watch_inbox(email_account, on_new_mail):
+        started.append((email_account.id, email_account.imap_password))
+        if email_account.id == other.id and len(started) <= 2:
+            raise RuntimeError("unexpected")
+        await asyncio.Event().wait()
+    monkeypatch.setattr(EmailService, "watch_inbox", staticmethod(watch_inbox))
+    
+    async def run():
+        try:
+            await scheduler_module.start_inbox_watchers()
+            await asyncio.sleep(0)
+            
+            account.imap_password = "changed"
+            db.commit()
+            await scheduler_module.start_inbox_watchers()
+            await asyncio.sleep(0)
+            return {
+                email_account_id: task.done()
+                for email_account_id, (_, task) in scheduler_module.inbox_watchers.items()
+            }
+        finally:
+            scheduler_module.stop_inbox_watchers()
+    
+    assert asyncio.run(run()) == {account.id: False, other.id: False}
+    assert sorted(started[2:]) == sorted([(account.id, "changed"), (other.id, other.imap_password)])
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from sqlalchemy import desc
+from app.models.models import WarmupEmail, WarmupStat, WarmupSummary, WarmupConfig
+from app.services.warmup_service import WarmupService
+
+STATUS_FIELDS = [
+    "is_active", "current_daily_limit", "days_in_warmup", "total_warmup_days",
+    "warmup_progress", "deliverability_score", "open_rate", "reply_rate",
+    "spam_rate", "total_emails_sent", "total_emails_received"
+]
+
+def reference_status(db, email_account_id):
+    """Warmup status computed directly from the emails and stats tables"""
+    config = db.query(WarmupConfig).filter(WarmupConfig.email_account_id == email_account_id).one()
+    days_in_warmup = (datetime.utcnow().date() - config.start_date.date()).days
+    latest_stat = db.query(WarmupStat).filter(
+        WarmupStat.email_account_id == email_account_id
+    ).order_by(desc(WarmupStat.date)).first()
+    return {
+        "is_active": config.is_active,
+        "current_daily_limit": config.current_daily_limit,
+        "days_in_warmup": days_in_warmup,
+        "total_warmup_days": config.warmup_days,
+        "warmup_progress": min(100, (days_in_warmup / config.warmup_days) * 100),
+        "deliverability_score": latest_stat.deliverability_score if latest_stat else 100,
+        "open_rate": latest_stat.open_rate if latest_stat else 0,
+        "reply_rate": latest_stat.reply_rate if latest_stat else 0,
+        "spam_rate": latest_stat.spam_rate if latest_stat else 0,
+        "total_emails_sent": db.query(WarmupEmail).filter(WarmupEmail.sender_id == email_account_id).count(),
+        "total_emails_received": db.query(WarmupEmail).filter(WarmupEmail.recipient_id == email_account_id).count()
+    }
+
+def add_email(db, message_id, sender_id, recipient_id, status="sent"):
+    db.add(WarmupEmail(
+        message_id=message_id,
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        subject="WARMUP-abcd1234: hello",
+        body="",
+        status=status,
+        sent_at=datetime.utcnow()
+    ))
+
+def assert_statuses_match(db, account_ids):
+    for email_account_id in account_ids:
+        status = WarmupService.get_warmup_status(db, email_account_id)
+        assert status["success"] is True
+        expected = reference_status(db, email_account_id)
+        assert {field: status[field] for field in STATUS_FIELDS} == expected
+
+def test_summaries_match_direct_counts(db, make_account):
+    a, b, c = (make_account(f"{name}@example.com").id for name in "abc")
+    add_email(db, "m1", a, b)
+    add_email(db, "m2", a, c, status="delivered")
+    add_email(db, "m3", b, a, status="replied")
+    today = datetime.utcnow()
+    db.add(WarmupStat(email_account_id=a, date=today - timedelta(days=1), deliverability_score=50.0, open_rate=10.0))
+    db.add(WarmupStat(email_account_id=a, date=today, deliverability_score=90.0, open_rate=40.0, reply_rate=20.0, spam_rate=10.0))
+    db.commit()
+    
+    # Accounts that were never refreshed are counted directly, without storing a summary
+    assert_statuses_match(db, [a, b, c])
+    assert WarmupService.get_warmup_status(db, c)["deliverability_score"] == 100
+    assert db.query(WarmupSummary).count() == 0
+    assert not db.new and not db.dirty
+    
+    # More emails followed by a refresh, as the warmup service does after sending
+    add_email(db, "m4", c, a)
+    add_email(db, "m5", c, b)
+    db.commit()
+    WarmupService.refresh_warmup_summaries(db, [a, b, c])
+    assert_statuses_match(db, [a, b, c])
+    assert WarmupService.get_warmup_status(db, c)["total_emails_sent"] == 2
+
+def test_refresh_keeps_one_summary_per_account(db, make_account):
+    a, b = (make_account(f"{name}@example.com").id for name in "ab")
+    add_email(db, "m1", a, b)
+    db.commit()
+    
+    for _ in range(3):
+        WarmupService.refresh_warmup_summaries(db, [a, b, a])
+    WarmupService.get_warmup_statuses(db, [a, b])
+    
+    assert db.query(WarmupSummary).count() == 2
+    assert {summary.email_account_id for summary in db.query(WarmupSummary)} == {a, b}
+
+def test_status_of_account_without_config(db, make_account):
+    account_id = make_account("a@example.com", with_config=False).id
+    
+    status = WarmupService.get_warmup_status(db, account_id)
+    assert status == {"success": False, "error": "Warmup configuration not found"}
+    assert WarmupService.get_warmup_status(db, account_id + 100)["error"] == "Email account not found"